@@ -0,0 +1,197 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+#Times "Dad's Class Sorter.py" and checks how good its groups are, so that
+#making it faster can't quietly make it worse. For each class shape
+#(students, groups, rounds) it runs the rounds the way main() does (sort,
+#halve the history, sort again...) and reports:
+#  - the median and 99th percentile time of one sort
+#  - the peak memory used along the way (as tracemalloc sees it, which
+#    includes NumPy's arrays). Tracing every allocation slows NumPy down a
+#    lot, so this comes from one more run of its own, from the first seed.
+#    It counts the HistoryArray, which takes 8 bytes per pair of students.
+#  - RepeatedPairs: every time two students share a group again after the
+#    first time, that's one (so a pair that meets three times counts 2)
+#  - MaxMeetings: the most times any one pair shares a group
+#  - FirstRepeatRound: the first round in which some pair meets again, or
+#    None if none ever do
+#Every shape is run once from each of the Seeds, which are the same every
+#time, so the same code gives the same groups. The quality numbers are
+#averaged over the seeds (except MaxMeetings, which is the worst, and
+#FirstRepeatRound, the earliest). The results can be saved as JSON and
+#compared with an earlier run, like SudokuBenchmark.py does.
+
+Folder = os.path.dirname(os.path.abspath(__file__))
+
+#The sorter's file name isn't something Python can import, so it's loaded
+#by path.
+Spec = importlib.util.spec_from_file_location("ClassSorter",
+                                              os.path.join(Folder, "Dad's Class Sorter.py"))
+ClassSorter = importlib.util.module_from_spec(Spec)
+sys.modules["ClassSorter"] = ClassSorter
+Spec.loader.exec_module(ClassSorter)
+
+#(students, groups, rounds). The first two are the class from the top of
+#"Dad's Class Sorter.py": 21 students in 5 groups.
+Shapes = [(21, 5, 4), (21, 5, 8), (30, 6, 6), (60, 15, 6), (200, 50, 6),
+          (1000, 250, 4), (3000, 300, 3)]
+Seeds = [0, 1, 2]
+
+#Runs Rounds rounds for one class shape from one Seed. Seconds is passed on
+#to sort (0 for the greedy sort alone; anything else makes the results
+#depend on how fast the machine is, not just on the Seed). Returns the time
+#of each sort in seconds, how many times each pair met (as a StudentCount x
+#StudentCount array) and the FirstRepeatRound.
+def RunRounds(StudentCount, GroupCount, Rounds, Seed, Seconds = 0):
+    random.seed(Seed)
+    np.random.seed(Seed)
+    ClassSorter.Student.resetCount()
+    Members = [ClassSorter.Student() for each in range(StudentCount)]
+    HistoryArray = np.zeros((StudentCount, StudentCount))
+    #(16 bits is plenty, and keeps this from adding much to the PeakMB)
+    Meetings = np.zeros((StudentCount, StudentCount), dtype=np.int16)
+    Times = []
+    FirstRepeatRound = None
+    for r in range(Rounds):
+        if r:
+            HistoryArray /= 2
+        Mob = ClassSorter.UnsortedMob(Members, HistoryArray, GroupCount, Quiet = True)
+        Start = time.perf_counter()
+        Mob.sort(Seconds, 1)
+        Times.append(time.perf_counter() - Start)
+        for G in Mob.SortResult.Groups:
+            Ids = [S.id for S in G.Students]
+            Meetings[np.ix_(Ids, Ids)] += 1
+            Meetings[Ids, Ids] -= 1
+            if FirstRepeatRound is None and (Meetings[np.ix_(Ids, Ids)] > 1).any():
+                FirstRepeatRound = r + 1
+    return Times, Meetings, FirstRepeatRound
+
+#Runs every shape from every seed and returns the results as a dictionary
+#that's ready to be saved as JSON.
+def RunBenchmark(Shapes = Shapes, Seeds = Seeds, Seconds = 0):
+    Results = []
+    for StudentCount, GroupCount, Rounds in Shapes:
+        Times = []
+        Repeated = []
+        MaxMeetings = 0
+        FirstRepeats = []
+        for Seed in Seeds:
+            SeedTimes, Meetings, FirstRepeatRound = RunRounds(StudentCount, GroupCount, Rounds,
+                                                              Seed, Seconds)
+            Times.extend(SeedTimes)
+            Pairs = Meetings[np.triu_indices(StudentCount, 1)]
+            Repeated.append(int(np.maximum(Pairs - 1, 0).sum()))
+            MaxMeetings = max(MaxMeetings, int(Pairs.max()))
+            if FirstRepeatRound is not None:
+                FirstRepeats.append(FirstRepeatRound)
+        tracemalloc.start()
+        RunRounds(StudentCount, GroupCount, Rounds, Seeds[0], Seconds)
+        Peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        Times.sort()
+        Results.append({"Students": StudentCount,
+                        "Groups": GroupCount,
+                        "Rounds": Rounds,
+                        "MedianMs": 1000 * Times[len(Times) // 2],
+                        "P99Ms": 1000 * Times[min(len(Times) - 1, int(len(Times) * 0.99))],
+                        "PeakMB": Peak / 1e6,
+                        "RepeatedPairs": sum(Repeated) / len(Repeated),
+                        "MaxMeetings": MaxMeetings,
+                        "FirstRepeatRound": min(FirstRepeats) if FirstRepeats else None})
+    return {"Python": platform.python_version(),
+            "Machine": platform.machine(),
+            "Seeds": list(Seeds),
+            "SearchSeconds": Seconds,
+            "Results": Results}
+
+#Compares a run with an earlier one (Baseline) and returns a list of
+#complaints: every shape whose median time went up by more than Tolerance
+#(0.2 meaning 20%), and every shape whose groups got worse, meaning more
+#RepeatedPairs (by more than QualityTolerance, 0.05 meaning 5%), a pair
+#meeting more often, or the first repeat coming sooner.
+def FindRegressions(Report, Baseline, Tolerance = 0.2, QualityTolerance = 0.05):
+    Before = {(Result["Students"], Result["Groups"], Result["Rounds"]): Result
+              for Result in Baseline["Results"]}
+    Complaints = []
+    for Result in Report["Results"]:
+        Old = Before.get((Result["Students"], Result["Groups"], Result["Rounds"]))
+        if Old is None:
+            continue
+        Name = "%d students, %d groups, %d rounds" % (Result["Students"], Result["Groups"],
+                                                      Result["Rounds"])
+        if Result["MedianMs"] > Old["MedianMs"] * (1 + Tolerance):
+            Complaints.append("%s: median went from %.3f ms to %.3f ms"
+                              % (Name, Old["MedianMs"], Result["MedianMs"]))
+        if Result["RepeatedPairs"] > Old["RepeatedPairs"] * (1 + QualityTolerance):
+            Complaints.append("%s: repeated pairs went from %.1f to %.1f"
+                              % (Name, Old["RepeatedPairs"], Result["RepeatedPairs"]))
+        if Result["MaxMeetings"] > Old["MaxMeetings"]:
+            Complaints.append("%s: a pair now meets %d times, not %d"
+                              % (Name, Result["MaxMeetings"], Old["MaxMeetings"]))
+        if Result["FirstRepeatRound"] is not None and (Old["FirstRepeatRound"] is None
+                or Result["FirstRepeatRound"] < Old["FirstRepeatRound"]):
+            Complaints.append("%s: the first repeat went from round %s to round %d"
+                              % (Name, Old["FirstRepeatRound"], Result["FirstRepeatRound"]))
+    return Complaints
+
+#Reads a shape written as STUDENTS,GROUPS,ROUNDS.
+def ParseShape(Text):
+    try:
+        StudentCount, GroupCount, Rounds = (int(x) for x in Text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("a shape is STUDENTS,GROUPS,ROUNDS, like 21,5,4")
+    return StudentCount, GroupCount, Rounds
+
+def main():
+    Parser = argparse.ArgumentParser(description = "Time the class sorter and check its groups.")
+    Parser.add_argument("--shape", action = "append", type = ParseShape,
+                        help = "class shape to run, as STUDENTS,GROUPS,ROUNDS "
+                               "(can be given more than once; default: all)")
+    Parser.add_argument("--seed", action = "append", type = int,
+                        help = "seed to run each shape from (can be given more than once; "
+                               "default: 0, 1 and 2)")
+    Parser.add_argument("-s", "--seconds", type = float, default = 0,
+                        help = "seconds for sort to spend improving each round (default: 0, "
+                               "the greedy sort alone)")
+    Parser.add_argument("-o", "--output", help = "save the results to this JSON file")
+    Parser.add_argument("-c", "--compare", help = "an earlier JSON file to check for regressions")
+    Parser.add_argument("--tolerance", type = float, default = 0.2,
+                        help = "how much slower a median can get before it counts (default: 0.2)")
+    Parser.add_argument("--quality-tolerance", type = float, default = 0.05,
+                        help = "how many more repeated pairs there can be before it counts "
+                               "(default: 0.05)")
+    Args = Parser.parse_args()
+    Report = RunBenchmark(Args.shape or Shapes, Args.seed or Seeds, Args.seconds)
+    print("%8s %6s %6s %10s %10s %8s %9s %11s %12s" % ("Students", "Groups", "Rounds", "Median ms",
+                                                       "P99 ms", "Peak MB", "Repeats",
+                                                       "MaxMeetings", "FirstRepeat"))
+    for Result in Report["Results"]:
+        print("%8d %6d %6d %10.3f %10.3f %8.1f %9.1f %11d %12s"
+              % (Result["Students"], Result["Groups"], Result["Rounds"], Result["MedianMs"],
+                 Result["P99Ms"], Result["PeakMB"], Result["RepeatedPairs"],
+                 Result["MaxMeetings"],
+                 "-" if Result["FirstRepeatRound"] is None else Result["FirstRepeatRound"]))
+    if Args.output:
+        with open(Args.output, "w") as Out:
+            json.dump(Report, Out, indent = 2)
+    if Args.compare:
+        with open(Args.compare) as In:
+            Complaints = FindRegressions(Report, json.load(In), Args.tolerance,
+                                         Args.quality_tolerance)
+        for Complaint in Complaints:
+            print("REGRESSION: " + Complaint)
+        if Complaints:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,27 @@ the lowest PotentialClashes (pairing history values from the
 HistoryArray). Evens and Odds ensure that groups are as
 close in size as possible.
 
+That greedy pass can paint itself into a corner, though, so sort
+can also take a few seconds to do better: starting from the greedy
+groups, it keeps swapping two students in different groups, and
+keeps the swap if it means fewer repeated pairings (or, now and
+then, even if it doesn't, so it can climb out of a dead end; this
+is "simulated annealing"). Several of these searches run at once,
+each starting from its own greedy groups, and the best one wins.
+
+Going one round at a time, though, every round is stuck with
+whatever the rounds before it did. If you know how many rounds
+you'll need, planSchedule works them all out together instead
+(this is known as the "social golfer problem"), and remembers the
+answer, since a schedule for 21 students in 5 groups works for
+any 21 students.
+
+And for a whole school's worth of classes, there's no typing names
+in one at a time: sortCohorts reads the rosters from a CSV file,
+sorts every class in its own worker process, and keeps each class's
+pairing history on disk (see PairHistory), so the next run carries
+on from where this one left off.
+
 Works cited: https://www.jstor.org/stable/822823?seq=1#page_scan_tab_contents
 
 @author: Chris
@@ -30,10 +51,30 @@ Works cited: https://www.jstor.org/stable/822823?seq=1#page_scan_tab_contents
 
 import numpy as np
 from itertools import count
+import argparse
+import csv
+import hashlib
+import json
+import math
+import multiprocessing
+import os
 import random
+import sqlite3
+import sys
+import time
+
+#How many seconds main() spends looking for better groups than the greedy
+#sort finds on its own (see UnsortedMob.sort). 0 means just the greedy sort.
+SearchSeconds = 1.0
+
+#Where planSchedule keeps the schedules it has already worked out.
+ScheduleCache = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Schedules.db")
 
 class UnsortedMob(object):
-    def __init__(self, Members = None,HistoryArray = None):
+    def __init__(self, Members = None,HistoryArray = None,GroupCount = None,Quiet = False):
+        #Quiet means don't print anything (and don't ask for anything
+        #either, so Members and GroupCount have to be given).
+        self.Quiet = Quiet
         self.SortResult = []
         Group.resetCount()
         Student.resetCount()
@@ -58,67 +99,90 @@ class UnsortedMob(object):
             self.HistoryArray = np.zeros((len(self.Members),len(self.Members)))
         else:
             self.HistoryArray = HistoryArray
-            print(HistoryArray)
-        #self.GroupCount = int(input("How many groups this time? "))
-        print("")
+        if GroupCount is None:
+            GroupCount = int(input("How many groups this time? "))
+        self.GroupCount = GroupCount
+        if not Quiet:
+            print("")
 
 
-    def sort(self):
+    #Sorts the Members into groups, adds the groups to the HistoryArray and
+    #prints them. With Seconds = 0, that's one greedy pass (greedyGroups).
+    #Otherwise it spends about that many seconds improving on it (see
+    #bestGroups), with Workers processes (all the cores if None), so Seconds
+    #is the knob that trades time for fewer repeated pairings.
+    def sort(self, Seconds = 0, Workers = None):
+        if Seconds > 0:
+            GroupOf = bestGroups(self, Seconds, Workers)
+        else:
+            GroupOf = self.greedyGroups()
         Groups = [Group(None) for each in range(self.GroupCount)]
-        #A list of students ordered by sum of previous pairings, greatest to least.
-        #Now with a randomizer for when the sum is the same.
-        r=np.random.random(len(self.Members))
-        MobRandomizer = np.lexsort((r,np.sum(self.HistoryArray,axis=0)))[::-1]
-        Sorted_Members = list(np.array(self.Members)[MobRandomizer])
-        Sorted_Groups = []
-        #Evens are the items in the Sorted_Members list that can be
-        #evenly divisible into groups with no students left over. Odds
-        #are the leftover students and fit in on top of some groups.
-        Evens = Sorted_Members[:len(Groups)*(len(Sorted_Members)//len(Groups))]
-        Odds = Sorted_Members[len(Groups)*(len(Sorted_Members)//len(Groups)):]
-        for M in Evens:
-            #Count how many repeated pairings if M is placed in a group
-            PotentialClashes = [0]*len(Groups)
-            for G in Groups:
-                for S in G.Students:
-                    PotentialClashes[G.id] += self.HistoryArray[M.id,S.id]
-            Sorted_Groups = [G for (C,G) in sorted(zip(PotentialClashes,Groups), key=lambda x: (x[0],random.random()))]
-            for G in Sorted_Groups:
-                if len(G.Students) < len(self.Members)//len(Groups):
-                    G.addStudent(M)
-                    #Update the history array
-                    for S in G.Students[:-1]:
-                        self.HistoryArray[S.id,M.id] += 1
-                        self.HistoryArray[M.id,S.id] += 1
-                    break
-        #A way to make this code less repetitive would be
-        #really good! This for loop is almost identical to the one in
-        #Evens except it has different restrictions on where Members of
-        #the Mob can be placed.
-        for M in Odds:
-            PotentialClashes = [0]*len(Groups)
-            for G in Groups:
-                for S in G.Students:
-                    PotentialClashes[G.id] += self.HistoryArray[M.id,S.id]
-            Sorted_Groups = [G for (C,G) in sorted(zip(PotentialClashes,Groups), key=lambda x: (x[0],random.random()))]
-            for G in Sorted_Groups:
-                if len(G.Students) < len(self.Members)//len(Groups) + 1:
-                    G.addStudent(M)
-                    #Update the history array
-                    for S in G.Students[:-1]:
-                        self.HistoryArray[S.id,M.id] += 1
-                        self.HistoryArray[M.id,S.id] += 1
-                    break
+        for M in self.Members:
+            Groups[GroupOf[M.id]].addStudent(M)
+        #Update the history array, one group at a time: everyone in a group
+        #gets one more pairing with everyone else in it, which is the outer
+        #product of the group's membership with itself (less the diagonal,
+        #since nobody pairs up with themselves).
+        for G in Groups:
+            Ids = [S.id for S in G.Students]
+            if isinstance(self.HistoryArray, PairHistory):
+                self.HistoryArray.addGroup(Ids)
+            else:
+                self.HistoryArray[np.ix_(Ids,Ids)] += 1
+                self.HistoryArray[Ids,Ids] -= 1
 
         #Frames the groups in a nice, polished SortedClass, then
         #prints them all.
         self.SortResult = SortedClass(Groups)
+        if self.Quiet:
+            return
         for G in self.SortResult.Groups:
             print("Group " + str(G.id+1))
             for S in G.Students:
                 print(S.Name)
             print("")
 
+    #The greedy pass described at the top: returns the group number of each
+    #student, by Student id. Random is where the random numbers come from:
+    #NumPy's own (np.random) if it's left out, or a np.random.Generator.
+    def greedyGroups(self, Random = None):
+        if Random is None:
+            Random = np.random
+        GroupCount = self.GroupCount
+        #A list of students ordered by sum of previous pairings, greatest to least.
+        #Now with a randomizer for when the sum is the same.
+        r=Random.random(len(self.Members))
+        MobRandomizer = np.lexsort((r,np.sum(self.HistoryArray,axis=0)))[::-1]
+        Sorted_Members = list(np.array(self.Members)[MobRandomizer])
+        #Evens are the items in the Sorted_Members list that can be
+        #evenly divisible into groups with no students left over. Odds
+        #are the leftover students and fit in on top of some groups.
+        #So the only difference between them is how big a group they're
+        #allowed to join: Evens can only go into a group that has fewer than
+        #GroupSize students, and Odds into one with no more than that.
+        GroupSize = len(self.Members)//GroupCount
+        EvenCount = GroupCount*GroupSize
+        #Which group each student is in, by Student id. Nobody is in a group
+        #yet, so they all start out in an extra, pretend group at the end.
+        GroupOf = np.full(len(self.HistoryArray), GroupCount)
+        Sizes = np.zeros(GroupCount, dtype=int)
+        for k, M in enumerate(Sorted_Members):
+            Limit = GroupSize if k < EvenCount else GroupSize + 1
+            #Count how many repeated pairings if M is placed in a group. That's
+            #M's row of the HistoryArray times a group-membership matrix, or
+            #in other words, M's pairing history with everyone in each group
+            #added up, which bincount does for all the groups in one go.
+            PotentialClashes = np.bincount(GroupOf, weights=self.HistoryArray[M.id],
+                                           minlength=GroupCount+1)[:-1]
+            PotentialClashes[Sizes >= Limit] = np.inf
+            #The group with room and the fewest clashes, picked at random if
+            #there's a tie.
+            Best = np.flatnonzero(PotentialClashes == PotentialClashes.min())
+            G = Random.choice(Best)
+            GroupOf[M.id] = G
+            Sizes[G] += 1
+        return GroupOf
+
 class SortedClass(object):
     def __init__(self, Groups = None):
         if Groups is None:
@@ -145,17 +209,484 @@ class Student(object):
         self.id = next(Student._ids)
         self.Name = ""
 
+#A pairing history that lives in a file rather than in memory, for classes
+#too big for a full HistoryArray, and so that it survives from one run to
+#the next. The HistoryArray is symmetric, with nothing on the diagonal, so
+#only the part above the diagonal is kept, row after row (HistoryArray[i,j]
+#for every i < j), as 16-bit floats: for 20,000 students that's 400 MB,
+#where the whole HistoryArray would be 3.2 GB. It's memory-mapped, so only
+#the parts in use are ever read in.
+#An UnsortedMob can be given one instead of a HistoryArray, since it answers
+#the same questions: len(), HistoryArray[i] (a student's row),
+#HistoryArray[np.ix_(Ids,Ids)] (a block of rows and columns) and
+#np.sum(HistoryArray, axis=0), plus addGroup for sort's updates.
+#The history of the class Cohort goes in two files in Folder: the numbers,
+#and the Names of the students, in order. If the Names have changed since
+#last time, the history of the students who are still there is kept.
+class PairHistory(object):
+    def __init__(self, Folder, Cohort, Names):
+        Base = os.path.join(Folder, safeFileName(Cohort))
+        self.Path = Base + ".pairs"
+        self.NamesPath = Base + ".json"
+        self.Names = list(Names)
+        self.n = len(self.Names)
+        #Where row i starts
+        self.Starts = np.array([i*self.n - i*(i+1)//2 for i in range(self.n)], dtype=np.int64)
+        Count = self.n*(self.n-1)//2
+        OldNames = None
+        if os.path.exists(self.NamesPath) and os.path.exists(self.Path):
+            with open(self.NamesPath) as NamesFile:
+                OldNames = json.load(NamesFile)
+        if OldNames == self.Names and Count:
+            self.Pairs = np.memmap(self.Path, dtype=np.float16, mode="r+", shape=(Count,))
+            return
+        #A new class, or a new roster: make a new file, carrying over what
+        #there is
+        Old = None
+        if OldNames is not None:
+            Old = PairHistory.__new__(PairHistory)
+            Old.n = len(OldNames)
+            Old.Starts = np.array([i*Old.n - i*(i+1)//2 for i in range(Old.n)], dtype=np.int64)
+            Old.Pairs = np.fromfile(self.Path, dtype=np.float16)
+        if Count:
+            self.Pairs = np.memmap(self.Path + ".new", dtype=np.float16, mode="w+", shape=(Count,))
+        else:
+            #np.memmap can't map an empty file
+            self.Pairs = np.zeros(0, dtype=np.float16)
+            open(self.Path + ".new", "wb").close()
+        if Old is not None and Count:
+            OldIndex = {Name: i for i, Name in enumerate(OldNames)}
+            Where = np.array([OldIndex.get(Name, -1) for Name in self.Names])
+            for i in range(self.n - 1):
+                if Where[i] >= 0:
+                    Row = Old[Where[i]]
+                    Later = Where[i+1:]
+                    self.Pairs[self.Starts[i]:self.Starts[i]+self.n-i-1] = np.where(Later >= 0, Row[Later], 0)
+        if Count:
+            self.Pairs.flush()
+        os.replace(self.Path + ".new", self.Path)
+        with open(self.NamesPath, "w") as NamesFile:
+            json.dump(self.Names, NamesFile)
+
+    def __len__(self):
+        return self.n
+
+    #The places in Pairs of HistoryArray[i,j], for arrays of i and j (which
+    #mustn't be equal)
+    def pairIndex(self, i, j):
+        Low = np.minimum(i, j)
+        High = np.maximum(i, j)
+        return self.Starts[Low] + High - Low - 1
+
+    #HistoryArray[i] (a whole row, as 64-bit floats), or
+    #HistoryArray[np.ix_(Rows,Cols)].
+    def __getitem__(self, Key):
+        if isinstance(Key, tuple):
+            Rows, Cols = np.broadcast_arrays(*Key)
+            Block = np.zeros(Rows.shape)
+            Off = Rows != Cols
+            Block[Off] = self.Pairs[self.pairIndex(Rows[Off], Cols[Off])]
+            return Block
+        i = int(Key)
+        Row = np.zeros(self.n)
+        Before = np.arange(i)
+        Row[:i] = self.Pairs[self.Starts[Before] + i - Before - 1]
+        Row[i+1:] = self.Pairs[self.Starts[i]:self.Starts[i]+self.n-i-1]
+        return Row
+
+    #The sum of every row (which, with the HistoryArray being symmetric, is
+    #the sum of every column too), one row at a time.
+    def sum(self, axis = None, dtype = None, out = None, **Ignored):
+        Totals = np.zeros(self.n)
+        for i in range(self.n - 1):
+            Row = self.Pairs[self.Starts[i]:self.Starts[i]+self.n-i-1].astype(np.float64)
+            Totals[i] += Row.sum()
+            Totals[i+1:] += Row
+        return Totals if axis is not None else Totals.sum()/2
+
+    #One more pairing for every pair of students in Ids.
+    def addGroup(self, Ids):
+        Ids = np.asarray(Ids)
+        i, j = np.triu_indices(len(Ids), 1)
+        self.Pairs[self.pairIndex(Ids[i], Ids[j])] += 1
+
+    #Multiplies the whole history by Factor, where it is (a slice at a time,
+    #so that it never needs another copy of it in memory).
+    def decay(self, Factor):
+        Step = 1 << 22
+        for k in range(0, len(self.Pairs), Step):
+            self.Pairs[k:k+Step] *= Factor
+
+    def flush(self):
+        if isinstance(self.Pairs, np.memmap):
+            self.Pairs.flush()
+
+#A file name for Name that's safe on any system (and, thanks to the hash on
+#the end, different for different Names).
+def safeFileName(Name):
+    Safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in Name)
+    return Safe + "-" + hashlib.md5(Name.encode()).hexdigest()[:8]
+
+#Reads the rosters of any number of classes from a CSV file with a header
+#row. The names come from the "Name" column (or the first one), and the
+#class from the "Class" or "Cohort" column, if there is one; otherwise it's
+#all one class, named after the file. Returns a dictionary of class to list
+#of names, in the order they first turn up.
+def readRosters(Path):
+    Rosters = {}
+    Default = os.path.splitext(os.path.basename(Path))[0]
+    with open(Path, newline="") as RosterFile:
+        Reader = csv.DictReader(RosterFile)
+        NameColumn = "Name" if "Name" in Reader.fieldnames else Reader.fieldnames[0]
+        ClassColumn = None
+        for Column in ("Class", "Cohort"):
+            if Column in Reader.fieldnames:
+                ClassColumn = Column
+        for Row in Reader:
+            Name = Row[NameColumn].strip()
+            if Name:
+                Cohort = Row[ClassColumn].strip() if ClassColumn else Default
+                Rosters.setdefault(Cohort, []).append(Name)
+    return Rosters
+
+#Sorts one class into groups of about GroupSize, for one worker process: the
+#history in Folder gets multiplied by Decay first (like main's halving), and
+#gets the new groups added afterwards. Seconds is passed on to sort. Returns
+#rows of (class, group number, name) for the CSV file.
+def sortCohort(Cohort, Names, GroupSize, Folder, Seconds, Decay):
+    History = PairHistory(Folder, Cohort, Names)
+    History.decay(Decay)
+    Student.resetCount()
+    Members = []
+    for Name in Names:
+        NewStudent = Student()
+        NewStudent.Name = Name
+        Members.append(NewStudent)
+    Mob = UnsortedMob(Members,History,max(1, round(len(Names)/GroupSize)),Quiet = True)
+    Mob.sort(Seconds, 1)
+    History.flush()
+    return [(Cohort, G + 1, S.Name) for G in range(len(Mob.SortResult.Groups))
+            for S in Mob.SortResult.Groups[G].Students]
+
+def sortCohortWorker(Args):
+    return sortCohort(*Args)
+
+#The whole pipeline: reads the rosters from RosterPath, sorts every class
+#(one worker process each, all the cores at once if Workers is None, or
+#everything in this process if it's 1), keeps their histories in Folder, and
+#writes the groups to OutPath as a CSV file of Class, Group, Name.
+def sortCohorts(RosterPath, OutPath, Folder, GroupSize = 4, Seconds = 0, Decay = 0.5,
+                Workers = None):
+    os.makedirs(Folder, exist_ok = True)
+    Jobs = [(Cohort, Names, GroupSize, Folder, Seconds, Decay)
+            for Cohort, Names in readRosters(RosterPath).items()]
+    if Workers is None:
+        Workers = os.cpu_count() or 1
+    with open(OutPath, "w", newline="") as OutFile:
+        Writer = csv.writer(OutFile)
+        Writer.writerow(["Class", "Group", "Name"])
+        if Workers == 1:
+            for Job in Jobs:
+                Writer.writerows(sortCohort(*Job))
+        else:
+            with multiprocessing.Pool(Workers) as Pool:
+                for Rows in Pool.imap_unordered(sortCohortWorker, Jobs):
+                    Writer.writerows(Rows)
+
+#Improves on GroupOf (a group number for each student, by Student id) by
+#swapping students between groups until time.time() reaches Deadline, and
+#returns the best groups it found, the same way, with their cost: the total
+#pairing history inside the groups (for every pair of students in the same
+#group, how often they've been paired before), which is what the search tries
+#to bring down. Swaps never change the size of a group. The trick that makes
+#each try cheap is Clashes: Clashes[g,i] is student i's pairing history with
+#everyone in group g, so what a swap of a (in group A) and b (in group B)
+#would do to the cost can be worked out from four numbers in Clashes and one
+#pair's history, however big the class. Only a swap that's kept costs more
+#than that: two rows of Clashes have to change.
+#The history is only ever read a row or a pair at a time, so a PairHistory
+#never gets copied into a dense array (which, for 5,000 students, would be
+#hundreds of megabytes more). Clashes still takes 8 bytes per student per
+#group, though.
+def improveGroups(HistoryArray, Ids, GroupOf, GroupCount, Deadline, Seed):
+    Random = random.Random(Seed)
+    N = len(Ids)
+    IdList = [int(i) for i in Ids]
+    if isinstance(HistoryArray, PairHistory):
+        Everyone = IdList == list(range(len(HistoryArray)))
+        Starts = HistoryArray.Starts
+        Stored = HistoryArray.Pairs
+        def row(a):
+            Row = HistoryArray[IdList[a]]
+            return Row if Everyone else Row[IdList]
+        def pair(a, b):
+            Low, High = sorted((IdList[a], IdList[b]))
+            return float(Stored[Starts[Low] + High - Low - 1])
+    else:
+        #(Averaged with its transpose, in case it isn't symmetric)
+        Pairs = HistoryArray[np.ix_(IdList,IdList)]
+        Pairs = (Pairs + Pairs.T)/2
+        np.fill_diagonal(Pairs, 0)
+        def row(a):
+            return Pairs[a]
+        def pair(a, b):
+            return Pairs[a,b]
+    Where = [int(GroupOf[i]) for i in IdList]
+    Clashes = np.zeros((GroupCount, N))
+    for a in range(N):
+        Clashes[Where[a]] += row(a)
+    def swapCost(a, b):
+        A = Where[a]
+        B = Where[b]
+        return (Clashes[B,a] - Clashes[A,a] + Clashes[A,b] - Clashes[B,b]
+                - 2*pair(a, b))
+    #The temperature: how much worse a swap can be and still stand a fair
+    #chance of being kept. It starts at about what a random swap costs,
+    #and cools to a thousandth of that by the Deadline.
+    Samples = []
+    for each in range(100):
+        a = Random.randrange(N)
+        b = Random.randrange(N)
+        if Where[a] != Where[b] and swapCost(a, b):
+            Samples.append(abs(swapCost(a, b)))
+    Start = np.mean(Samples) if Samples else 1.0
+    StartTime = time.time()
+    #(Every pair is counted from both ends, hence the halving)
+    Cost = Best = float(Clashes[Where, np.arange(N)].sum())/2
+    BestWhere = list(Where)
+    Tries = 0
+    while Best > 0:
+        if Tries % 256 == 0:
+            Now = time.time()
+            if Now >= Deadline:
+                break
+            Temperature = Start * 0.001 ** ((Now - StartTime)/max(Deadline - StartTime, 1e-9))
+        Tries += 1
+        a = Random.randrange(N)
+        b = Random.randrange(N)
+        A = Where[a]
+        B = Where[b]
+        if A == B:
+            continue
+        Delta = swapCost(a, b)
+        if Delta <= 0 or Random.random() < math.exp(-Delta/Temperature):
+            Change = row(b) - row(a)
+            Clashes[A] += Change
+            Clashes[B] -= Change
+            Where[a] = B
+            Where[b] = A
+            Cost += Delta
+            if Cost < Best - 1e-9:
+                Best = Cost
+                BestWhere = list(Where)
+    Improved = np.array(GroupOf)
+    Improved[IdList] = BestWhere
+    return max(Best, 0.0), Improved
+
+#One search, for one worker process: greedy groups to start from, then
+#improveGroups. Each gets its own Seed, so they all search differently, and
+#its own random number generators, made from it, so nobody else's random
+#numbers get disturbed (which matters when it runs in the caller's process).
+def searchGroups(Mob, Deadline, Seed):
+    Ids = [M.id for M in Mob.Members]
+    return improveGroups(Mob.HistoryArray, Ids, Mob.greedyGroups(np.random.default_rng(Seed)),
+                         Mob.GroupCount, Deadline, Seed)
+
+#Runs one search per worker process (all the cores if Workers is None; with
+#1, it runs in this process) for Seconds seconds, and returns the groups of
+#the best one, the way greedyGroups does.
+def bestGroups(Mob, Seconds, Workers = None):
+    if Workers is None:
+        Workers = os.cpu_count() or 1
+    Deadline = time.time() + Seconds
+    Seeds = [random.randrange(2**32) for each in range(Workers)]
+    if Workers == 1:
+        Results = [searchGroups(Mob, Deadline, Seeds[0])]
+    else:
+        with multiprocessing.Pool(Workers) as Pool:
+            Results = Pool.starmap(searchGroups, [(Mob, Deadline, Seed) for Seed in Seeds])
+    return min(Results, key=lambda Result: Result[0])[1]
+
+#How many repeated pairings a schedule has: a pair that meets m times in
+#all counts m*(m-1)/2, so meeting three times is worse than two pairs meeting
+#twice. Meetings[i][j] is how many rounds students i and j share a group.
+def scheduleCost(Meetings):
+    return sum(m*(m-1)//2 for Row in Meetings for m in Row)//2
+
+#One search for a whole Rounds-round schedule, for one worker process.
+#Every round starts out as a random split into GroupCount groups (as close
+#in size as possible), and then, like improveGroups, it keeps swapping two
+#students in different groups of one round until time.time() reaches
+#Deadline (or nobody meets anybody twice). Working out what a swap of a and
+#b would do only means going through the two groups involved, whatever the
+#number of rounds or students. Returns the best schedule found, as a list of
+#rounds, each a list of groups, each a list of student numbers (0 to
+#StudentCount - 1), with its scheduleCost.
+def searchSchedule(StudentCount, GroupCount, Rounds, Deadline, Seed):
+    Random = random.Random(Seed)
+    Meetings = [[0]*StudentCount for each in range(StudentCount)]
+    Schedule = []
+    Where = []
+    for r in range(Rounds):
+        Order = list(range(StudentCount))
+        Random.shuffle(Order)
+        Groups = [Order[g::GroupCount] for g in range(GroupCount)]
+        Schedule.append(Groups)
+        Where.append([0]*StudentCount)
+        for g in range(GroupCount):
+            for i in Groups[g]:
+                Where[r][i] = g
+                for j in Groups[g]:
+                    if i != j:
+                        Meetings[i][j] += 1
+    Cost = Best = scheduleCost(Meetings)
+    BestSchedule = [[list(G) for G in Groups] for Groups in Schedule]
+    #The temperature, as in improveGroups, but in repeated pairings: it
+    #starts where a swap that makes two more is still kept now and then.
+    StartTime = time.time()
+    Tries = 0
+    while Best > 0 and GroupCount > 1:
+        if Tries % 256 == 0:
+            Now = time.time()
+            if Now >= Deadline:
+                break
+            Temperature = 2.0 * 0.01 ** ((Now - StartTime)/max(Deadline - StartTime, 1e-9))
+        Tries += 1
+        r = Random.randrange(Rounds)
+        a = Random.randrange(StudentCount)
+        b = Random.randrange(StudentCount)
+        A = Where[r][a]
+        B = Where[r][b]
+        if A == B:
+            continue
+        #a leaves everyone else in A for everyone else in B, and b the
+        #other way around
+        Ma = Meetings[a]
+        Mb = Meetings[b]
+        Delta = 0
+        for x in Schedule[r][A]:
+            if x != a:
+                Delta += Mb[x] - Ma[x] + 1
+        for y in Schedule[r][B]:
+            if y != b:
+                Delta += Ma[y] - Mb[y] + 1
+        if Delta <= 0 or Random.random() < math.exp(-Delta/Temperature):
+            for x in Schedule[r][A]:
+                if x != a:
+                    Ma[x] -= 1
+                    Meetings[x][a] -= 1
+                    Mb[x] += 1
+                    Meetings[x][b] += 1
+            for y in Schedule[r][B]:
+                if y != b:
+                    Mb[y] -= 1
+                    Meetings[y][b] -= 1
+                    Ma[y] += 1
+                    Meetings[y][a] += 1
+            Schedule[r][A][Schedule[r][A].index(a)] = b
+            Schedule[r][B][Schedule[r][B].index(b)] = a
+            Where[r][a] = B
+            Where[r][b] = A
+            Cost += Delta
+            if Cost < Best:
+                Best = Cost
+                BestSchedule = [[list(G) for G in Groups] for Groups in Schedule]
+    return Best, BestSchedule
+
+#Works out a schedule of Rounds rounds for StudentCount students in
+#GroupCount groups, with as few repeated pairings over all the rounds as it
+#can find in about Seconds seconds, using one searchSchedule per worker
+#process (all the cores if Workers is None; with 1, it runs in this
+#process). Returns it the way searchSchedule does, without the cost.
+#Schedules are saved in an SQLite database at CachePath (None for no
+#saving), by class shape, so the same shape is answered straight away next
+#time. A later search that does better replaces the saved schedule, and
+#Refresh = True makes it search even if there's one saved already.
+def planSchedule(StudentCount, GroupCount, Rounds, Seconds = 10.0, Workers = None,
+                 CachePath = ScheduleCache, Refresh = False):
+    Database = None
+    Saved = None
+    if CachePath is not None:
+        Database = sqlite3.connect(CachePath, timeout = 60)
+        Database.execute("CREATE TABLE IF NOT EXISTS Schedules (Students INTEGER, "
+                         "Groups INTEGER, Rounds INTEGER, Cost INTEGER, Schedule TEXT, "
+                         "PRIMARY KEY (Students, Groups, Rounds))")
+        Saved = Database.execute("SELECT Cost, Schedule FROM Schedules WHERE Students = ? "
+                                 "AND Groups = ? AND Rounds = ?",
+                                 (StudentCount, GroupCount, Rounds)).fetchone()
+    try:
+        if Saved is not None and (not Refresh or Saved[0] == 0):
+            return json.loads(Saved[1])
+        if Workers is None:
+            Workers = os.cpu_count() or 1
+        Deadline = time.time() + Seconds
+        Jobs = [(StudentCount, GroupCount, Rounds, Deadline, random.randrange(2**32))
+                for each in range(Workers)]
+        if Workers == 1:
+            Results = [searchSchedule(*Jobs[0])]
+        else:
+            with multiprocessing.Pool(Workers) as Pool:
+                Results = Pool.starmap(searchSchedule, Jobs)
+        Cost, Schedule = min(Results, key=lambda Result: Result[0])
+        if Saved is not None and Saved[0] <= Cost:
+            return json.loads(Saved[1])
+        if Database is not None:
+            Database.execute("INSERT OR REPLACE INTO Schedules VALUES (?, ?, ?, ?, ?)",
+                             (StudentCount, GroupCount, Rounds, Cost, json.dumps(Schedule)))
+            Database.commit()
+        return Schedule
+    finally:
+        if Database is not None:
+            Database.close()
+
+#Prints a schedule from planSchedule with the Members' names, the way sort
+#prints one round.
+def printSchedule(Members, Schedule):
+    for r in range(len(Schedule)):
+        print("Group Assignment #" + str(r+1))
+        for g in range(len(Schedule[r])):
+            print("Group " + str(g+1))
+            for i in Schedule[r][g]:
+                print(Members[i].Name)
+            print("")
+        print("----------")
+
+#With a roster file on the command line, runs sortCohorts; otherwise asks
+#for the names, one at a time.
 def main():
+    if len(sys.argv) > 1:
+        Parser = argparse.ArgumentParser(description = "Sort classes into peer-editing groups.")
+        Parser.add_argument("Rosters", help = "CSV file with a Name column (and a Class column)")
+        Parser.add_argument("-o", "--output", default = "groups.csv")
+        Parser.add_argument("-g", "--group-size", type = int, default = 4)
+        Parser.add_argument("--history", default = "History",
+                            help = "folder to keep the pairing histories in")
+        Parser.add_argument("-s", "--seconds", type = float, default = 0,
+                            help = "seconds to spend improving each class's groups (this "
+                                   "needs 8 bytes per student per group of memory)")
+        Parser.add_argument("-d", "--decay", type = float, default = 0.5,
+                            help = "what the history gets multiplied by before each run")
+        Parser.add_argument("-w", "--workers", type = int, default = None)
+        Args = Parser.parse_args()
+        sortCohorts(Args.Rosters, Args.output, Args.history, Args.group_size, Args.seconds,
+                    Args.decay, Args.workers)
+        return
     Mob = UnsortedMob()
+    #Plan all the rounds at once, if we know how many there'll be.
+    Rounds = input("How many rounds? (Press Enter to go one round at a time) ")
+    if Rounds != "":
+        printSchedule(Mob.Members, planSchedule(len(Mob.Members), Mob.GroupCount, int(Rounds)))
+        return
     print("Group Assignment #1")
-    Mob.sort()
+    Mob.sort(SearchSeconds)
     print("----------")
     #Shuffles the groups over and over and over again.
     i = 2
     while True:
         print("Group Assignment #" + str(i) + ".", end = " ")
-        NewMob = UnsortedMob(Mob.Members,Mob.HistoryArray / 2)
-        NewMob.sort()
+        Mob.HistoryArray /= 2
+        NewMob = UnsortedMob(Mob.Members,Mob.HistoryArray,Mob.GroupCount)
+        NewMob.sort(SearchSeconds)
         Mob = NewMob
         i+=1
         print("----------")
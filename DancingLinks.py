@@ -0,0 +1,247 @@
+#A second way of solving Sudoku, which doesn't use any of the logic in
+#SudokuSolver.py. Instead it treats the puzzle as an "exact cover" problem and
+#solves it with Donald Knuth's Dancing Links (Algorithm X).
+
+#The exact cover version of Sudoku is a big table of 0s and 1s. Every row of
+#the table is one possible move ("put a 7 in row 2, column 5") and every
+#column is one rule that has to be satisfied exactly once:
+#  - every cell holds exactly one number               (81 columns)
+#  - every row holds each number exactly once          (81 columns)
+#  - every column holds each number exactly once       (81 columns)
+#  - every block holds each number exactly once        (81 columns)
+#So for a 9x9 grid that's 729 rows and 324 columns, and each row has exactly
+#four 1s in it. Solving the puzzle means picking 81 rows that between them have
+#exactly one 1 in every column.
+
+#Dancing Links stores only the 1s, as nodes in circular doubly-linked lists
+#running left-right along each row and up-down along each column. Taking a
+#column out of play ("covering" it) is just unhooking nodes from their
+#neighbours, and putting it back is hooking them in again in reverse order,
+#so trying a move and undoing it costs almost nothing. The links are kept in
+#plain lists of integers (L, R, U, D) rather than node objects, which makes
+#copying the whole table for a new puzzle a handful of fast list copies.
+
+#Node 0 is the root, nodes 1 to ColumnCount are the column headers, and the
+#rest are the 1s of the table.
+class ExactCover(object):
+    def __init__(self, ColumnCount):
+        self.ColumnCount = ColumnCount
+        Headers = range(ColumnCount + 1)
+        self.L = [h - 1 for h in Headers]
+        self.L[0] = ColumnCount
+        self.R = [h + 1 for h in Headers]
+        self.R[ColumnCount] = 0
+        self.U = list(Headers)
+        self.D = list(Headers)
+        self.C = list(Headers)
+        #How many 1s are left in each column
+        self.S = [0] * (ColumnCount + 1)
+        #Which table row each node belongs to (-1 for the root and headers)
+        self.RowOf = [-1] * (ColumnCount + 1)
+        #The first node of each table row
+        self.RowStart = []
+
+    #Adds a table row with 1s in the given columns (numbered from 0).
+    def AddRow(self, Columns):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        First = len(L)
+        Row = len(self.RowStart)
+        self.RowStart.append(First)
+        for j in range(len(Columns)):
+            Node = First + j
+            Col = Columns[j] + 1
+            L.append(Node - 1 if j else First + len(Columns) - 1)
+            R.append(Node + 1 if j < len(Columns) - 1 else First)
+            U.append(U[Col])
+            D.append(Col)
+            C.append(Col)
+            self.RowOf.append(Row)
+            D[U[Col]] = Node
+            U[Col] = Node
+            S[Col] += 1
+
+    #Returns an independent copy of the table, so that one table can be built
+    #once and then reused for puzzle after puzzle.
+    def Copy(self):
+        New = ExactCover.__new__(ExactCover)
+        New.ColumnCount = self.ColumnCount
+        New.L = self.L[:]
+        New.R = self.R[:]
+        New.U = self.U[:]
+        New.D = self.D[:]
+        New.C = self.C
+        New.S = self.S[:]
+        New.RowOf = self.RowOf
+        New.RowStart = self.RowStart
+        return New
+
+    #Unhooks column Col from the header list, and every row that has a 1 in
+    #Col from all the other columns it touches.
+    def Cover(self, Col):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        R[L[Col]] = R[Col]
+        L[R[Col]] = L[Col]
+        i = D[Col]
+        while i != Col:
+            j = R[i]
+            while j != i:
+                D[U[j]] = D[j]
+                U[D[j]] = U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    #Exactly undoes Cover(Col), working in the opposite order.
+    def Uncover(self, Col):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[Col]
+        while i != Col:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                D[U[j]] = j
+                U[D[j]] = j
+                j = L[j]
+            i = U[i]
+        R[L[Col]] = Col
+        L[R[Col]] = Col
+
+    #Takes table row Row out of the table for good, before the search starts
+    #(this is how moves that are already known to be wrong are left out).
+    #Has to come before any Select, which might have unhooked it already.
+    def RemoveRow(self, Row):
+        U, D, C, S = self.U, self.D, self.C, self.S
+        First = self.RowStart[Row]
+        Node = First
+        while True:
+            D[U[Node]] = D[Node]
+            U[D[Node]] = U[Node]
+            S[C[Node]] -= 1
+            Node = self.R[Node]
+            if Node == First:
+                return
+
+    #Commits to table row Row before the search starts (this is how the clues
+    #of a puzzle go in). Returns False if the row clashes with one already
+    #committed to.
+    def Select(self, Row):
+        First = self.RowStart[Row]
+        Node = First
+        while True:
+            Col = self.C[Node]
+            #A covered column has been unhooked from the header list
+            if self.R[self.L[Col]] != Col:
+                return False
+            self.Cover(Col)
+            Node = self.R[Node]
+            if Node == First:
+                return True
+
+    #Algorithm X. Always branches on the column with the fewest 1s left, which
+    #keeps the search tree tiny. Returns a list of up to Limit solutions, each
+    #of them a list of the table rows that make it up. Written as a loop with
+    #its own stack rather than as a recursive function, so even big grids
+    #can't run into Python's recursion limit.
+    def Search(self, Limit = 1):
+        R, L, D, C, S = self.R, self.L, self.D, self.C, self.S
+        Cover = self.Cover
+        Uncover = self.Uncover
+        RowOf = self.RowOf
+        Solutions = []
+        Stack = []
+        Forward = True
+        while True:
+            if Forward:
+                if R[0] == 0:
+                    Solutions.append([RowOf[Node] for Node in Stack])
+                    if len(Solutions) >= Limit:
+                        return Solutions
+                    Forward = False
+                    continue
+                #Pick the column with the fewest 1s
+                Col = R[0]
+                Best = S[Col]
+                j = R[Col]
+                while j != 0 and Best > 1:
+                    if S[j] < Best:
+                        Col = j
+                        Best = S[j]
+                    j = R[j]
+                if Best == 0:
+                    Forward = False
+                    continue
+                Cover(Col)
+                Node = D[Col]
+                Stack.append(Node)
+                j = R[Node]
+                while j != Node:
+                    Cover(C[j])
+                    j = R[j]
+            else:
+                #Backtrack: undo the latest move and try the next row down in
+                #the same column, or keep backing up if there isn't one.
+                if not Stack:
+                    return Solutions
+                Node = Stack.pop()
+                j = L[Node]
+                while j != Node:
+                    Uncover(C[j])
+                    j = L[j]
+                Col = C[Node]
+                Node = D[Node]
+                if Node == Col:
+                    Uncover(Col)
+                    continue
+                Stack.append(Node)
+                j = R[Node]
+                while j != Node:
+                    Cover(C[j])
+                    j = R[j]
+                Forward = True
+
+#The empty Sudoku table for each BoxSize, built the first time it's needed.
+#Table row number (Index * Size + Digit) means "put Digit + 1 in cell Index".
+SudokuTables = {}
+
+def SudokuTable(BoxSize):
+    if BoxSize not in SudokuTables:
+        Size = BoxSize * BoxSize
+        Table = ExactCover(4 * Size * Size)
+        for r in range(Size):
+            for c in range(Size):
+                b = (r // BoxSize) * BoxSize + c // BoxSize
+                for d in range(Size):
+                    Table.AddRow([r * Size + c,
+                                  Size * Size + r * Size + d,
+                                  2 * Size * Size + c * Size + d,
+                                  3 * Size * Size + b * Size + d])
+        SudokuTables[BoxSize] = Table
+    return SudokuTables[BoxSize]
+
+#Solves a puzzle given as a flat list of numbers (0 for an empty cell, 1 to
+#Size otherwise). Returns up to Limit solutions in the same format, so an
+#empty list means the puzzle has no solution.
+#Options, if given, is a Mask for each cell (bit d set if d + 1 can still go
+#there, like the Grid's), and the moves it rules out are taken out of the
+#table first. Without them, Dancing Links has only the clues to go on, and
+#on a 25x25 puzzle that can mean minutes of searching.
+def SolveSudoku(Numbers, BoxSize = 3, Limit = 1, Options = None):
+    Size = BoxSize * BoxSize
+    Table = SudokuTable(BoxSize).Copy()
+    if Options is not None:
+        for Index in range(Size * Size):
+            if not Numbers[Index]:
+                for d in range(Size):
+                    if not Options[Index] >> d & 1:
+                        Table.RemoveRow(Index * Size + d)
+    for Index in range(Size * Size):
+        if Numbers[Index]:
+            if not Table.Select(Index * Size + Numbers[Index] - 1):
+                return []
+    Solutions = []
+    for Rows in Table.Search(Limit):
+        Solution = list(Numbers)
+        for Row in Rows:
+            Solution[Row // Size] = Row % Size + 1
+        Solutions.append(Solution)
+    return Solutions
@@ -0,0 +1,126 @@
+import numpy as np
+import SudokuSolver
+
+#Solving puzzles one at a time means a Python loop over every Cell of every
+#puzzle. This solves a whole batch at once instead: the Options of every Cell
+#of every puzzle live in one (puzzles, 81) array of 9-bit Masks (the same
+#Masks the Grid uses, as uint16), and each rule is a handful of NumPy
+#operations that apply to all of the puzzles together. The rules are the same
+#ones the Grid uses:
+#  - a placed number is taken out of the Options of its row, column and block
+#  - naked singles (a Cell with only one Option left)
+#  - hidden singles (a number with only one place left in a row, column or
+#    block)
+#  - ghost numbers (see Grid.HandleGhostNumbers)
+#The rules are applied over and over until they stop changing anything. Any
+#puzzle that logic alone can't finish is then handed to BacktrackSolve one at
+#a time, starting from the Options the batch already worked out.
+
+#The unit tables from SudokuSolver as arrays, MaskSize (how many Options each
+#of the 512 Masks holds), a NumPy version of DigitBit (NumberBit, indexed by
+#number, with 0 for an empty Cell), and a table that turns a single-bit Mask
+#back into its number.
+Units = np.array(SudokuSolver.Units)
+CellUnits = np.array(SudokuSolver.CellUnits)
+MaskSize = np.array([SudokuSolver.CountOptions(m) for m in range(SudokuSolver.FullMask + 1)],
+                    dtype=np.int8)
+NumberBit = np.array([0] + [1 << d for d in range(9)], dtype=np.uint16)
+BitNumber = np.zeros(SudokuSolver.FullMask + 1, dtype=np.int8)
+for d in range(9):
+    BitNumber[1 << d] = d + 1
+
+#The ghost numbers rule works on the 54 places where a block crosses a row or
+#a column (3 Cells each). For each of these "mini-lines," BlockRest holds the
+#other 6 Cells of the block and LineRest the other 6 Cells of the row or
+#column. GhostSources lists, for each Cell, the 4 mini-lines whose LineRest
+#it's in (two along its row and two along its column).
+MiniLines = []
+BlockRest = []
+LineRest = []
+for b in range(9):
+    Block = SudokuSolver.Units[18 + b]
+    for Line in ([Block[0:3], Block[3:6], Block[6:9]]
+                 + [Block[0::3], Block[1::3], Block[2::3]]):
+        u = SudokuSolver.CellUnits[Line[0]][0 if Line[1] == Line[0] + 1 else 1]
+        MiniLines.append(Line)
+        BlockRest.append([i for i in Block if i not in Line])
+        LineRest.append([i for i in SudokuSolver.Units[u] if i not in Line])
+MiniLines = np.array(MiniLines)
+BlockRest = np.array(BlockRest)
+LineRest = np.array(LineRest)
+GhostSources = np.array([[m for m in range(len(LineRest)) if i in LineRest[m]]
+                         for i in range(81)])
+
+#ORs together the Masks of each group of Cells in Table, for every puzzle.
+def OrOver(Masks, Table):
+    return np.bitwise_or.reduce(Masks[:, Table], axis=2)
+
+#Applies the rules to a batch until nothing changes. Numbers is (puzzles, 81)
+#with 0 for an empty Cell, Masks is (puzzles, 81) with the Options of each
+#Cell. Both are updated in place. Returns a True/False array of which puzzles
+#turned out to be broken (a number twice in a unit, or nowhere left for one
+#to go).
+def Deduce(Numbers, Masks):
+    Broken = np.zeros(len(Numbers), dtype=bool)
+    #Only the puzzles that changed on the last round get looked at again
+    Active = np.arange(len(Numbers))
+    while len(Active):
+        N = Numbers[Active]
+        M = Masks[Active]
+        Empty = N == 0
+        Used = OrOver(NumberBit[N], Units)
+        M &= ~(Used[:, CellUnits[:, 0]] | Used[:, CellUnits[:, 1]] | Used[:, CellUnits[:, 2]])
+        M[~Empty] = 0
+        #Which Options turn up at least once and at least twice in each unit
+        #(like Grid.TallyOptions)
+        InUnits = M[:, Units]
+        Once = np.zeros(Used.shape, dtype=np.uint16)
+        Twice = np.zeros(Used.shape, dtype=np.uint16)
+        for Position in range(9):
+            Twice |= Once & InUnits[:, :, Position]
+            Once |= InUnits[:, :, Position]
+        #Broken if a number is repeated in a unit, if it can't go anywhere in
+        #a unit, or if an empty Cell is out of Options
+        Bad = ((~Empty)[:, Units].sum(axis=2) != MaskSize[Used]).any(axis=1)
+        Bad |= ((Used | Once) != SudokuSolver.FullMask).any(axis=1)
+        Bad |= (Empty & (M == 0)).any(axis=1)
+        #Naked and hidden singles. A Cell that comes up with more than one
+        #hidden single is broken anyway, so just the lowest one is taken.
+        Hidden = Once & ~Twice
+        New = np.where(MaskSize[M] == 1, M,
+                       M & (Hidden[:, CellUnits[:, 0]] | Hidden[:, CellUnits[:, 1]]
+                            | Hidden[:, CellUnits[:, 2]]))
+        New &= -New
+        Changed = (New != 0).any(axis=1)
+        N = np.where(New != 0, BitNumber[New], N)
+        #Ghost numbers, but only for puzzles where the singles found nothing
+        Stuck = ~Changed & ~Bad
+        if Stuck.any():
+            S = M[Stuck]
+            Ghosts = OrOver(S, MiniLines) & ~OrOver(S, BlockRest)
+            Gone = OrOver(Ghosts, GhostSources) & S
+            M[Stuck] = S & ~Gone
+            Changed[Stuck] = (Gone != 0).any(axis=1)
+        Numbers[Active] = N
+        Masks[Active] = M
+        Broken[Active] |= Bad
+        Active = Active[Changed & ~Bad]
+    return Broken
+
+#Solves a batch of puzzles. Puzzles is an array of shape (puzzles, 81), row by
+#row, with 0 for an empty Cell. Returns an array of the same shape with the
+#solutions. A puzzle with no solution comes back as a row of 0s.
+def SolveBatch(Puzzles):
+    Numbers = np.array(Puzzles, dtype=np.int8).reshape(-1, 81)
+    Masks = np.full(Numbers.shape, SudokuSolver.FullMask, dtype=np.uint16)
+    Broken = Deduce(Numbers, Masks)
+    Numbers[Broken] = 0
+    #Whatever logic couldn't finish goes through the search, one at a time
+    for p in np.flatnonzero(~Broken & (Numbers == 0).any(axis=1)):
+        NewGrid = SudokuSolver.Grid(Board = np.concatenate((Masks[p], Numbers[p])))
+        Solved = SudokuSolver.BacktrackSolve(NewGrid)
+        if Solved is None:
+            Numbers[p] = 0
+        else:
+            Numbers[p] = Solved.Board[81:162]
+    return Numbers
@@ -0,0 +1,286 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import SudokuBatch
+import SudokuSolver
+
+#Times the solver engines on the puzzle files in the Puzzles folder, one
+#"tier" per file (easy.txt is the "easy" tier, and so on). For each engine and
+#tier it reports:
+#  - the median and 99th percentile time to solve one puzzle
+#  - how many puzzles it gets through per second
+#  - how many propagation passes (Grid.Propagate runs) it took, for the
+#    engines that propagate
+#  - how many puzzles came back wrong or unsolved ("Failures")
+#The results can be saved as JSON, and compared with an earlier run to catch
+#anything that got slower.
+#With --startup, it times how long the solver takes to start up instead (see
+#CheckStartup), and with --check-steps it checks IterSolve (see CheckSteps).
+
+Folder = os.path.dirname(os.path.abspath(__file__))
+PuzzleFolder = os.path.join(Folder, "Puzzles")
+Engines = ["Deduction", "DancingLinks", "Batch"]
+
+#The modules a program can import to solve one puzzle at a time, and how
+#many milliseconds each one is allowed to take to import (as measured by
+#python -X importtime, with the .pyc files already made). None of them may
+#import NumPy.
+StartupBudgets = {"SudokuSolver": 30.0, "SudokuCache": 40.0}
+
+#Reads every puzzle file in Folder. Returns a dictionary of tier name to a
+#list of puzzle lines, skipping blank lines and "#" comments.
+def LoadTiers(Folder = PuzzleFolder):
+    Tiers = {}
+    for Name in sorted(os.listdir(Folder)):
+        if Name.endswith(".txt"):
+            with open(os.path.join(Folder, Name)) as PuzzleFile:
+                Tiers[Name[:-4]] = [Line.strip() for Line in PuzzleFile
+                                    if Line.strip() and not Line.startswith("#")]
+    return Tiers
+
+#Checks that Solution (a one-line grid) is full, follows the rules and keeps
+#all the clues of Puzzle.
+def IsSolution(Puzzle, Solution):
+    if Solution is None or len(Solution) != len(Puzzle):
+        return False
+    for Clue, Number in zip(Puzzle, Solution):
+        if Clue not in ".0" and Clue != Number:
+            return False
+    TheShape = SudokuSolver.ShapeOf(int(round(len(Puzzle) ** 0.25)))
+    for Unit in TheShape.Units:
+        if sorted(Solution[i] for i in Unit) != sorted(TheShape.Digits):
+            return False
+    return True
+
+#Solves every puzzle in Puzzles Repeat times with the Deduction or
+#DancingLinks engine. Returns the time of each solve in seconds, the total
+#number of propagation passes (None for DancingLinks) and the number of
+#failures.
+def TimeSingles(Puzzles, Engine, Repeat):
+    Times = []
+    Passes = 0 if Engine == "Deduction" else None
+    Failures = 0
+    for Puzzle in Puzzles:
+        for r in range(Repeat):
+            Start = time.perf_counter()
+            try:
+                Solved = SudokuSolver.RecursiveSolve(SudokuSolver.ReadGrid(Puzzle), Engine)
+                Solution = SudokuSolver.GridToLine(Solved)
+            except ValueError:
+                Solved = None
+                Solution = None
+            Times.append(time.perf_counter() - Start)
+            if r == 0:
+                Failures += not IsSolution(Puzzle, Solution)
+                if Passes is not None and Solved is not None:
+                    Passes += Solved.Passes
+    return Times, Passes, Failures
+
+#The same for the Batch engine, which solves all the puzzles in one go, so
+#each of the Repeat runs gives one time per puzzle: the time for the whole
+#batch divided by the number of puzzles. Only 9x9 puzzles can go in a batch.
+def TimeBatch(Puzzles, Repeat):
+    Numbers = np.array([SudokuSolver.ReadNumbers(Puzzle) for Puzzle in Puzzles], dtype=np.int8)
+    Times = []
+    for r in range(Repeat):
+        Start = time.perf_counter()
+        Solved = SudokuBatch.SolveBatch(Numbers)
+        Times.append((time.perf_counter() - Start) / len(Puzzles))
+    Failures = 0
+    for Puzzle, Solution in zip(Puzzles, Solved):
+        Failures += not IsSolution(Puzzle, "".join(str(n) for n in Solution))
+    return Times, None, Failures
+
+#Runs every engine on every tier and returns the results as a dictionary
+#that's ready to be saved as JSON.
+def RunBenchmark(Tiers, Engines = Engines, Repeat = 3):
+    Results = []
+    for Engine in Engines:
+        for Tier, Puzzles in Tiers.items():
+            if not Puzzles:
+                continue
+            if Engine == "Batch":
+                if any(len(Puzzle) != 81 for Puzzle in Puzzles):
+                    continue
+                Times, Passes, Failures = TimeBatch(Puzzles, Repeat)
+            else:
+                Times, Passes, Failures = TimeSingles(Puzzles, Engine, Repeat)
+            Times.sort()
+            Results.append({"Engine": Engine,
+                            "Tier": Tier,
+                            "Puzzles": len(Puzzles),
+                            "MedianMs": 1000 * Times[len(Times) // 2],
+                            "P99Ms": 1000 * Times[min(len(Times) - 1, int(len(Times) * 0.99))],
+                            "PuzzlesPerSecond": len(Times) / sum(Times),
+                            "PropagationPasses": Passes,
+                            "Failures": Failures})
+    return {"Python": platform.python_version(),
+            "Machine": platform.machine(),
+            "Repeat": Repeat,
+            "Results": Results}
+
+#Imports Module in a fresh Python Repeat times with -X importtime, and returns
+#the median import time in milliseconds and whether NumPy got imported. The
+#first run is thrown away, since it may still have to make the .pyc files.
+def TimeImport(Module, Repeat = 5):
+    Environment = dict(os.environ)
+    Environment.pop("PYTHONDONTWRITEBYTECODE", None)
+    Times = []
+    LoadsNumPy = False
+    for r in range(Repeat + 1):
+        Run = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + Module],
+                             cwd = Folder, env = Environment, capture_output = True, text = True)
+        if Run.returncode:
+            raise RuntimeError(Run.stderr)
+        #Each line is "import time: <self> | <cumulative> | <module>", in
+        #microseconds
+        for Line in Run.stderr.splitlines():
+            Fields = Line.split("|")
+            if len(Fields) != 3:
+                continue
+            Name = Fields[2].strip()
+            if Name == "numpy":
+                LoadsNumPy = True
+            if Name == Module and r:
+                Times.append(int(Fields[1]) / 1000)
+    return statistics.median(Times), LoadsNumPy
+
+#Times a whole run of "python SudokuSolver.py <puzzle>", start to finish, the
+#way a program that solves one puzzle at a time would see it, and returns
+#the median in milliseconds.
+def TimeCommandLine(Puzzle, Repeat = 5):
+    Times = []
+    for r in range(Repeat + 1):
+        Start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(Folder, "SudokuSolver.py"), Puzzle],
+                       cwd = Folder, capture_output = True, check = True)
+        if r:
+            Times.append(1000 * (time.perf_counter() - Start))
+    return statistics.median(Times)
+
+#Checks every module in StartupBudgets against its budget. Prints what it
+#found and returns a list of complaints, like FindRegressions.
+def CheckStartup(Repeat = 5):
+    Complaints = []
+    print("%-13s %10s %10s %6s" % ("Module", "Import ms", "Budget ms", "NumPy"))
+    for Module, Budget in StartupBudgets.items():
+        Milliseconds, LoadsNumPy = TimeImport(Module, Repeat)
+        print("%-13s %10.1f %10.1f %6s" % (Module, Milliseconds, Budget, "yes" if LoadsNumPy else "no"))
+        if Milliseconds > Budget:
+            Complaints.append("%s: import took %.1f ms, over the budget of %.1f ms"
+                              % (Module, Milliseconds, Budget))
+        if LoadsNumPy:
+            Complaints.append("%s: imports NumPy" % Module)
+    Puzzle = LoadTiers()["hard"][0]
+    print("python SudokuSolver.py <hard puzzle>: %.1f ms" % TimeCommandLine(Puzzle, Repeat))
+    return Complaints
+
+#Checks that IterSolve still gets to the right answer after the other things
+#a program might do to the same Grid first: counting its solutions, and then
+#having the player put one right Number in with Grid.Enter. Runs on up to
+#Limit puzzles from each tier. Prints what it found and returns a list of
+#complaints, like FindRegressions.
+def CheckSteps(Tiers, Limit = 20):
+    Complaints = []
+    for Tier, Puzzles in Tiers.items():
+        Checked = 0
+        for Puzzle in Puzzles[:Limit]:
+            Solution = SudokuSolver.GridToLine(SudokuSolver.RecursiveSolve(SudokuSolver.ReadGrid(Puzzle)))
+            TheGrid = SudokuSolver.ReadGrid(Puzzle)
+            Unique = SudokuSolver.HasUniqueSolution(TheGrid)
+            Index = next(i for i, Clue in enumerate(Puzzle) if Clue in ".0")
+            TheGrid.Enter(Index, SudokuSolver.Symbols.index(Solution[Index]) + 1)
+            try:
+                for Step in SudokuSolver.IterSolve(TheGrid):
+                    pass
+                Result = SudokuSolver.GridToLine(TheGrid)
+            except ValueError:
+                Result = None
+            if Unique and Result != Solution:
+                Complaints.append("%s: count, Enter and IterSolve went wrong on %s" % (Tier, Puzzle))
+            Checked += 1
+        print("%-10s %4d puzzles checked" % (Tier, Checked))
+    return Complaints
+
+#Compares a run with an earlier one (Baseline) and returns a list of
+#complaints: every engine and tier whose median time went up by more than
+#Tolerance (0.2 meaning 20%), and any new failures.
+def FindRegressions(Report, Baseline, Tolerance = 0.2):
+    Before = {(Result["Engine"], Result["Tier"]): Result for Result in Baseline["Results"]}
+    Complaints = []
+    for Result in Report["Results"]:
+        Old = Before.get((Result["Engine"], Result["Tier"]))
+        if Old is None:
+            continue
+        Name = Result["Engine"] + " on " + Result["Tier"]
+        if Result["MedianMs"] > Old["MedianMs"] * (1 + Tolerance):
+            Complaints.append("%s: median went from %.3f ms to %.3f ms"
+                              % (Name, Old["MedianMs"], Result["MedianMs"]))
+        if Result["Failures"] > Old["Failures"]:
+            Complaints.append("%s: failures went from %d to %d"
+                              % (Name, Old["Failures"], Result["Failures"]))
+    return Complaints
+
+def main():
+    Parser = argparse.ArgumentParser(description = "Time the Sudoku solver engines.")
+    Parser.add_argument("-e", "--engine", action = "append", choices = Engines,
+                        help = "engine to time (can be given more than once; default: all)")
+    Parser.add_argument("-t", "--tier", action = "append",
+                        help = "tier to time, i.e. a file in Puzzles without the .txt (default: all)")
+    Parser.add_argument("-r", "--repeat", type = int, default = 3,
+                        help = "how many times to solve each puzzle")
+    Parser.add_argument("-o", "--output", help = "save the results to this JSON file")
+    Parser.add_argument("-c", "--compare", help = "an earlier JSON file to check for regressions")
+    Parser.add_argument("--tolerance", type = float, default = 0.2,
+                        help = "how much slower a median can get before it counts (default: 0.2)")
+    Parser.add_argument("--startup", action = "store_true",
+                        help = "check how long the solver takes to start up instead")
+    Parser.add_argument("--check-steps", action = "store_true",
+                        help = "check that IterSolve gets the right answers instead")
+    Args = Parser.parse_args()
+    if Args.check_steps:
+        Tiers = LoadTiers()
+        if Args.tier:
+            Tiers = {Tier: Tiers[Tier] for Tier in Args.tier}
+        Complaints = CheckSteps(Tiers)
+        for Complaint in Complaints:
+            print("WRONG: " + Complaint)
+        sys.exit(1 if Complaints else 0)
+    if Args.startup:
+        Complaints = CheckStartup(Args.repeat)
+        for Complaint in Complaints:
+            print("OVER BUDGET: " + Complaint)
+        sys.exit(1 if Complaints else 0)
+    Tiers = LoadTiers()
+    if Args.tier:
+        Tiers = {Tier: Tiers[Tier] for Tier in Args.tier}
+    Report = RunBenchmark(Tiers, Args.engine or Engines, Args.repeat)
+    print("%-13s %-10s %8s %10s %10s %12s %9s %9s" % ("Engine", "Tier", "Puzzles", "Median ms",
+                                                      "P99 ms", "Puzzles/s", "Passes", "Failures"))
+    for Result in Report["Results"]:
+        print("%-13s %-10s %8d %10.3f %10.3f %12.1f %9s %9d"
+              % (Result["Engine"], Result["Tier"], Result["Puzzles"], Result["MedianMs"],
+                 Result["P99Ms"], Result["PuzzlesPerSecond"],
+                 "-" if Result["PropagationPasses"] is None else Result["PropagationPasses"],
+                 Result["Failures"]))
+    if Args.output:
+        with open(Args.output, "w") as Out:
+            json.dump(Report, Out, indent = 2)
+    if Args.compare:
+        with open(Args.compare) as In:
+            Complaints = FindRegressions(Report, json.load(In), Args.tolerance)
+        for Complaint in Complaints:
+            print("REGRESSION: " + Complaint)
+        if Complaints:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import multiprocessing
+import os
+import sys
+from collections import deque
+from itertools import islice
+
+import SudokuCache
+import SudokuSolver
+
+#Solves a whole file of puzzles (or whatever comes in on stdin), one puzzle
+#per line in the usual 81-character format (or the 256- and 625-character
+#ones for 16x16 and 25x25 grids, see SudokuSolver.ReadNumbers), and writes
+#the solutions out one per line in the same order. A line that isn't a
+#puzzle, or a puzzle with no solution, gets "No solution" instead.
+
+#The lines are read in chunks of ChunkSize and each chunk goes to one of a
+#pool of worker processes. Only a couple of chunks per worker are ever
+#waiting around at once, so the memory used stays the same however long the
+#file is. (Pool.imap would be simpler, but it reads the whole input as fast
+#as it can, which defeats the point.)
+
+#With --cache, each process keeps its own SudokuCache.SolutionCache, made the
+#first time SolveChunk needs one. (They can still share the --cache-file.)
+Cache = None
+
+#Solves one chunk of lines with the given Engine and returns a list with the
+#solution line (or None) for each. "Batch" uses SudokuBatch.SolveBatch on the
+#whole chunk; anything else is passed on to SudokuSolver.RecursiveSolve, or to
+#a SolutionCache in front of it if CacheSize isn't 0. (Batch doesn't use the
+#cache, since it solves a puzzle faster than the cache can look one up.)
+def SolveChunk(Lines, Engine, CacheSize = 0, CachePath = None):
+    global Cache
+    if Engine == "Batch":
+        return SolveChunkBatch(Lines)
+    if CacheSize and Cache is None:
+        Cache = SudokuCache.SolutionCache(CacheSize, CachePath, Engine)
+    Solutions = []
+    for Line in Lines:
+        try:
+            if CacheSize:
+                Solved = Cache.Solve(SudokuSolver.ReadGrid(Line))
+            else:
+                Solved = SudokuSolver.RecursiveSolve(SudokuSolver.ReadGrid(Line), Engine)
+            Solutions.append(SudokuSolver.GridToLine(Solved))
+        except ValueError:
+            Solutions.append(None)
+    return Solutions
+
+#The batch version of SolveChunk. Reading and writing the lines one number at
+#a time would take longer than the solving, so the 9x9 puzzles are glued
+#together and turned into one array in a single step, and the solutions are
+#turned back into text the same way. Anything else goes through the
+#"Deduction" engine. (NumPy, and SudokuBatch with it, only gets imported
+#here, so that the other engines start up without it.)
+def SolveChunkBatch(Lines):
+    import numpy as np
+    import SudokuBatch
+    Lines = [Line.strip().replace(".", "0") for Line in Lines]
+    Good = [len(Line) == 81 and Line.isascii() and Line.isdigit() for Line in Lines]
+    Puzzles = np.frombuffer("".join(Line for Line, IsPuzzle in zip(Lines, Good) if IsPuzzle).encode(),
+                            dtype=np.uint8).reshape(-1, 81) - ord("0")
+    Solved = SudokuBatch.SolveBatch(Puzzles)
+    Text = (Solved.astype(np.uint8) + ord("0")).tobytes().decode()
+    Solutions = []
+    p = 0
+    for Line, IsPuzzle in zip(Lines, Good):
+        if not IsPuzzle:
+            #Maybe a bigger grid, which SolveBatch doesn't do
+            Solutions.extend(SolveChunk([Line], "Deduction"))
+        elif Solved[p].any():
+            Solutions.append(Text[p * 81:p * 81 + 81])
+        else:
+            Solutions.append(None)
+        p += IsPuzzle
+    return Solutions
+
+#A generator that takes puzzle lines from Lines and yields their solutions
+#(or None) in the same order. Blank lines and lines starting with "#" are
+#skipped. Workers is the number of worker processes (all the cores if None;
+#with 1, everything runs in this process). CacheSize and CachePath are for
+#SolveChunk.
+def SolveStream(Lines, Workers = None, ChunkSize = 1000, Engine = "Batch",
+                CacheSize = 0, CachePath = None):
+    Lines = (Line for Line in Lines if Line.strip() and not Line.startswith("#"))
+    Chunks = iter(lambda: list(islice(Lines, ChunkSize)), [])
+    if Workers is None:
+        Workers = os.cpu_count() or 1
+    if Workers == 1:
+        for Chunk in Chunks:
+            yield from SolveChunk(Chunk, Engine, CacheSize, CachePath)
+        return
+    with multiprocessing.Pool(Workers) as Pool:
+        Pending = deque()
+        for Chunk in Chunks:
+            Pending.append(Pool.apply_async(SolveChunk, (Chunk, Engine, CacheSize, CachePath)))
+            if len(Pending) >= 2 * Workers:
+                yield from Pending.popleft().get()
+        while Pending:
+            yield from Pending.popleft().get()
+
+def main():
+    Parser = argparse.ArgumentParser(description = "Solve a file of one-line Sudoku puzzles.")
+    Parser.add_argument("Puzzles", nargs = "?", default = "-",
+                        help = "file with one puzzle per line (default: stdin)")
+    Parser.add_argument("-o", "--output", default = "-",
+                        help = "where to write the solutions (default: stdout)")
+    Parser.add_argument("-w", "--workers", type = int, default = None,
+                        help = "number of worker processes (default: one per core)")
+    Parser.add_argument("-c", "--chunk-size", type = int, default = 1000,
+                        help = "puzzles per chunk sent to a worker")
+    Parser.add_argument("-e", "--engine", default = "Batch",
+                        choices = ["Batch", "Deduction", "DancingLinks"])
+    Parser.add_argument("--cache", type = int, default = 0,
+                        help = "remember this many solutions per worker, so repeated puzzles "
+                               "(even with the numbers, rows or columns shuffled) aren't solved "
+                               "again (not for the Batch engine)")
+    Parser.add_argument("--cache-file",
+                        help = "also keep the solutions in this SQLite file, for the next run")
+    Args = Parser.parse_args()
+    In = sys.stdin if Args.Puzzles == "-" else open(Args.Puzzles)
+    Out = sys.stdout if Args.output == "-" else open(Args.output, "w")
+    try:
+        for Solution in SolveStream(In, Args.workers, Args.chunk_size, Args.engine,
+                                    Args.cache, Args.cache_file):
+            Out.write((Solution or "No solution") + "\n")
+    finally:
+        if In is not sys.stdin:
+            In.close()
+        if Out is not sys.stdout:
+            Out.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import sqlite3
+from collections import OrderedDict
+from itertools import groupby, islice, permutations, product
+
+import SudokuSolver
+
+#A cache of solutions that also recognizes a puzzle it has seen before in
+#disguise. A Sudoku puzzle is still the same puzzle if you:
+#  - swap the numbers around (every 1 becomes a 7 and every 7 a 1, say)
+#  - swap rows within a band (a band being a row of blocks), or swap bands
+#  - swap columns within a stack (a column of blocks), or swap stacks
+#  - flip the grid over its diagonal, so rows become columns
+#Each puzzle is turned into a "canonical form" that every disguise of it
+#turns into as well, and the solution is stored under that. On a hit, the
+#stored solution gets put through the same disguise in reverse.
+
+#The canonical form is the smallest of the puzzle's disguises, written on one
+#line with the numbers relabelled in order of first appearance. Trying every
+#disguise would take far too long (millions of them for a 9x9 grid), so rows
+#and columns are first sorted by a "signature" that no disguise can change:
+#how many clues there are in each column (or row) the line crosses, and how
+#often each of the line's numbers turns up in the whole puzzle. Only lines
+#with the same signature need to be tried both ways round, and for most
+#puzzles there aren't any, which leaves just two disguises to try (flipped
+#and not). If there are too many ties (MaxOrders), only the first orders are
+#tried. The solution that comes back is still right, but a disguise of the
+#same puzzle might then get a different canonical form, and miss the cache.
+MaxOrders = 64
+
+#Every order of Items sorted by Key, where Items with the same Key can go in
+#either order. (A generator, so nobody has to make all of them.)
+def TieOrders(Items, Key):
+    Groups = [list(Group) for k, Group in groupby(sorted(Items, key = Key), Key)]
+    for Choice in product(*[permutations(Group) for Group in Groups]):
+        yield [Item for Group in Choice for Item in Group]
+
+#Every order of the lines of a grid (rows, or columns), as a list of line
+#numbers, with the groups of BoxSize lines (bands, or stacks) sorted by the
+#signatures of the lines in them, and the lines inside each group sorted by
+#their own signatures.
+def LineOrders(Signatures, BoxSize):
+    Groups = [list(range(g * BoxSize, g * BoxSize + BoxSize)) for g in range(BoxSize)]
+    def GroupKey(Group):
+        return sorted(Signatures[Line] for Line in Group)
+    for GroupOrder in TieOrders(Groups, GroupKey):
+        for Choice in product(*[TieOrders(Group, Signatures.__getitem__) for Group in GroupOrder]):
+            yield [Line for Group in Choice for Line in Group]
+
+#Works out the canonical form of a puzzle, given as a flat list of numbers (0
+#for an empty cell). Returns three things:
+#  - Key, the canonical form on one line ("." for an empty cell)
+#  - Positions, where each cell of the canonical form came from: canonical
+#    cell k is cell Positions[k] of the puzzle
+#  - Labels, what each number became: number n of the puzzle is number
+#    Labels[n] of the canonical form (with Labels[0] = 0)
+def Canonicalize(Numbers):
+    Size = int(round(len(Numbers) ** 0.5))
+    BoxSize = int(round(Size ** 0.5))
+    Count = [0] * (Size + 1)
+    for n in Numbers:
+        Count[n] += 1
+    Count[0] = 0
+    RowClues = [Size - Numbers[r * Size:r * Size + Size].count(0) for r in range(Size)]
+    ColClues = [Size - Numbers[c::Size].count(0) for c in range(Size)]
+    #The signature of a line: for each block it crosses, the sorted (how
+    #often its number turns up, how many clues cross it) of its cells
+    def Signature(Cells, Crossing):
+        return sorted(sorted((Count[Numbers[Cells[p]]], Crossing[p])
+                             for p in range(s, s + BoxSize))
+                      for s in range(0, Size, BoxSize))
+    RowSignatures = [Signature(range(r * Size, r * Size + Size), ColClues) for r in range(Size)]
+    ColSignatures = [Signature(range(c, Size * Size, Size), RowClues) for c in range(Size)]
+    Best = None
+    for Flipped in (False, True):
+        if Flipped:
+            Across, Down = 1, Size
+            RowOrders = LineOrders(ColSignatures, BoxSize)
+            ColOrders = list(islice(LineOrders(RowSignatures, BoxSize), MaxOrders))
+        else:
+            Across, Down = Size, 1
+            RowOrders = LineOrders(RowSignatures, BoxSize)
+            ColOrders = list(islice(LineOrders(ColSignatures, BoxSize), MaxOrders))
+        for Rows in islice(RowOrders, max(1, MaxOrders // len(ColOrders))):
+            for Cols in ColOrders:
+                Positions = [r * Across + c * Down for r in Rows for c in Cols]
+                Labels = [0] * (Size + 1)
+                Next = 1
+                Line = []
+                for i in Positions:
+                    n = Numbers[i]
+                    if n and not Labels[n]:
+                        Labels[n] = Next
+                        Next += 1
+                    Line.append(Labels[n])
+                if Best is None or Line < Best[0]:
+                    Best = (Line, Positions, Labels)
+    Line, Positions, Labels = Best
+    #Numbers that aren't in the puzzle at all get the labels that are left
+    Next = max(Labels) + 1
+    for n in range(1, Size + 1):
+        if not Labels[n]:
+            Labels[n] = Next
+            Next += 1
+    Key = "".join(SudokuSolver.Symbols[n - 1] if n else "." for n in Line)
+    return Key, Positions, Labels
+
+#A solution cache in front of RecursiveSolve. The MaxSize most recently used
+#solutions are kept in memory, and the oldest one is thrown out to make room
+#for a new one. If Path is given, every solution also goes into an SQLite
+#database there, which is checked whenever the memory misses, so solutions
+#survive from one run to the next (and can be shared between processes).
+#Puzzles with no solution are remembered too. Hits and Misses count how the
+#lookups went.
+class SolutionCache(object):
+    def __init__(self, MaxSize = 10000, Path = None, Engine = "Deduction"):
+        self.MaxSize = MaxSize
+        self.Engine = Engine
+        self.Memory = OrderedDict()
+        self.Hits = 0
+        self.Misses = 0
+        self.Database = None
+        if Path is not None:
+            self.Database = sqlite3.connect(Path, timeout = 60)
+            self.Database.execute("CREATE TABLE IF NOT EXISTS Solutions "
+                                  "(Puzzle TEXT PRIMARY KEY, Solution TEXT)")
+            self.Database.commit()
+
+    #Looks up the solution of a canonical form, first in memory and then on
+    #disk. Returns None if it isn't in the cache, and "" if the puzzle is
+    #known to have no solution.
+    def Lookup(self, Key):
+        Solution = self.Memory.get(Key)
+        if Solution is not None:
+            self.Memory.move_to_end(Key)
+            return Solution
+        if self.Database is not None:
+            Row = self.Database.execute("SELECT Solution FROM Solutions WHERE Puzzle = ?",
+                                        (Key,)).fetchone()
+            if Row is not None:
+                self.Remember(Key, Row[0])
+                return Row[0]
+        return None
+
+    #Puts a solution in memory, making room for it if need be.
+    def Remember(self, Key, Solution):
+        self.Memory[Key] = Solution
+        self.Memory.move_to_end(Key)
+        while len(self.Memory) > self.MaxSize:
+            self.Memory.popitem(last = False)
+
+    #Solves a puzzle given as a flat list of numbers (0 for an empty cell),
+    #from the cache if possible. Returns the solution in the same format, or
+    #None if the puzzle has no solution.
+    def SolveNumbers(self, Numbers):
+        Key, Positions, Labels = Canonicalize(list(Numbers))
+        Solution = self.Lookup(Key)
+        if Solution is None:
+            self.Misses += 1
+            try:
+                Solved = SudokuSolver.RecursiveSolve(SudokuSolver.ReadGrid(Key), self.Engine)
+                Solution = SudokuSolver.GridToLine(Solved)
+            except ValueError:
+                Solution = ""
+            self.Remember(Key, Solution)
+            if self.Database is not None:
+                self.Database.execute("INSERT OR REPLACE INTO Solutions VALUES (?, ?)",
+                                      (Key, Solution))
+                self.Database.commit()
+        else:
+            self.Hits += 1
+        if not Solution:
+            return None
+        #Undo the disguise: canonical number Labels[n] is number n, and
+        #canonical cell k is cell Positions[k]
+        Unlabel = [0] * len(Labels)
+        for n in range(len(Labels)):
+            Unlabel[Labels[n]] = n
+        Answer = [0] * len(Numbers)
+        for k in range(len(Positions)):
+            Answer[Positions[k]] = Unlabel[SudokuSolver.Symbols.index(Solution[k]) + 1]
+        return Answer
+
+    #The cached version of RecursiveSolve: fills in the Cells of GridNow and
+    #returns it, or raises ValueError if the puzzle has no solution.
+    def Solve(self, GridNow):
+        N = GridNow.Shape.CellCount
+        Solution = self.SolveNumbers(GridNow.Board[N:2 * N])
+        if Solution is None:
+            raise ValueError("This puzzle has no solution")
+        GridNow.Fill(Solution)
+        return GridNow
+
+    def Close(self):
+        if self.Database is not None:
+            self.Database.close()
+            self.Database = None
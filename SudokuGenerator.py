@@ -0,0 +1,215 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+from collections import deque
+
+import SudokuSolver
+
+#Makes new puzzles, as many as you like, of whatever difficulty you like. A
+#puzzle starts out as a random full grid, and then clues are taken away, in
+#random order, for as long as the puzzle still has only one solution.
+
+#Checking that the solution is still unique is where all the time goes, so
+#it's done the cheap way wherever possible. For every difficulty short of
+#"Evil," the check is simply whether Grid.DeduceAll can still fill the grid
+#with the techniques that difficulty allows: if logic alone gets to the end,
+#there can't be another solution, and the puzzle can't be any harder than
+#wanted either. Only "Evil" puzzles, which need guessing, go through a real
+#search, and even then it's a search for a solution that differs from the
+#known one in the Cell that was just emptied, which BacktrackSolve gives up
+#on much faster than it would count every solution.
+
+#The difficulties, easiest first, and the techniques (from
+#SudokuSolver.AllTechniques) that each one brings in. "Easy" puzzles can be
+#done with naked and hidden singles alone. "Evil" ones need guessing.
+Difficulties = ["Easy", "Medium", "Hard", "Expert", "Evil"]
+TechniqueDifficulty = {"Pointing and claiming": "Medium",
+                       "Naked pairs": "Hard",
+                       "Hidden pairs": "Hard",
+                       "Naked triples": "Hard",
+                       "Hidden triples": "Hard",
+                       "X-Wing": "Expert",
+                       "Naked quads": "Expert",
+                       "Hidden quads": "Expert",
+                       "Swordfish": "Expert"}
+
+#The techniques a puzzle of the given difficulty is allowed to need.
+def TechniquesFor(Difficulty):
+    Level = Difficulties.index(Difficulty)
+    return [(Name, Technique) for Name, Technique in SudokuSolver.AllTechniques
+            if Difficulties.index(TechniqueDifficulty[Name]) <= Level]
+
+#Makes a random full grid, as a flat list of numbers. The blocks down the
+#diagonal don't share any rows or columns, so they can be filled in at random
+#without any checking, and BacktrackSolve takes care of the rest.
+def RandomFullGrid(BoxSize = 3, Random = random):
+    TheShape = SudokuSolver.ShapeOf(BoxSize)
+    Numbers = [0] * TheShape.CellCount
+    for b in range(0, TheShape.Size, BoxSize + 1):
+        Block = TheShape.Units[2 * TheShape.Size + b]
+        Shuffled = Random.sample(range(1, TheShape.Size + 1), TheShape.Size)
+        for i in range(TheShape.Size):
+            Numbers[Block[i]] = Shuffled[i]
+    Solved = SudokuSolver.BacktrackSolve(SudokuSolver.GridFromNumbers(Numbers))
+    return Solved.Board[TheShape.NumberStart:TheShape.UsedStart]
+
+#Says how hard a puzzle (a flat list of numbers) is: the difficulty of the
+#hardest technique DeduceAll had to use, or "Evil" if logic alone wasn't
+#enough. DeduceAll only moves on to a technique when all the easier ones are
+#stuck, so any technique that took away an Option was really needed.
+def Rate(Numbers):
+    TheGrid = SudokuSolver.GridFromNumbers(Numbers)
+    TheGrid.Stats = SudokuSolver.SolveStats()
+    if not TheGrid.DeduceAll() or TheGrid.EmptyCount:
+        return "Evil"
+    Level = 0
+    for Name, Eliminated in TheGrid.Stats.Eliminations.items():
+        if Eliminated and Name in TechniqueDifficulty:
+            Level = max(Level, Difficulties.index(TechniqueDifficulty[Name]))
+    return Difficulties[Level]
+
+#True if the puzzle (with Cell Index just emptied) still has Solution as its
+#only solution, using only the given Techniques, or guessing too if Guess.
+def StillUnique(Numbers, Index, Solution, Techniques, Guess):
+    TheGrid = SudokuSolver.GridFromNumbers(Numbers)
+    if not Guess:
+        return TheGrid.DeduceAll(Techniques) and TheGrid.EmptyCount == 0
+    #Is there a solution with something else in Cell Index?
+    TheGrid.Board[Index] &= ~(1 << (Solution[Index] - 1))
+    return SudokuSolver.BacktrackSolve(TheGrid) is None
+
+#Digs one puzzle out of a random full grid, aiming for the given Difficulty,
+#and returns it (as a flat list of numbers) with how hard it really came out
+#(see Rate). Taking clues away only ever makes a puzzle harder, and the
+#digging only uses the techniques Difficulty allows, so it never comes out
+#harder than that, but it often comes out easier: nearly always, for
+#"Expert". It's still a perfectly good puzzle for the difficulty it did come
+#out at, which is why the rating comes with it.
+def MakeRatedPuzzle(Difficulty = "Medium", BoxSize = 3, Random = random):
+    Guess = Difficulty == "Evil"
+    Techniques = TechniquesFor("Expert" if Guess else Difficulty)
+    Solution = RandomFullGrid(BoxSize, Random)
+    Numbers = list(Solution)
+    for Index in Random.sample(range(len(Numbers)), len(Numbers)):
+        Numbers[Index] = 0
+        if not StillUnique(Numbers, Index, Solution, Techniques, Guess):
+            Numbers[Index] = Solution[Index]
+    return Numbers, Rate(Numbers)
+
+#Makes one puzzle of the given Difficulty, as a flat list of numbers. Keeps
+#trying until it gets one, throwing away the ones that come out easier (see
+#GeneratePuzzles for a way to keep them).
+def MakePuzzle(Difficulty = "Medium", BoxSize = 3, Random = random):
+    while True:
+        Numbers, Rating = MakeRatedPuzzle(Difficulty, BoxSize, Random)
+        if Rating == Difficulty:
+            return Numbers
+
+#What a worker process runs: digs puzzle number Seed, so that the same seed
+#always gives the same puzzle, and returns it on one line, with its rating.
+def MakePuzzleLine(Difficulty, BoxSize, Seed):
+    Numbers, Rating = MakeRatedPuzzle(Difficulty, BoxSize, random.Random(Seed))
+    return "".join(SudokuSolver.Symbols[n - 1] if n else "." for n in Numbers), Rating
+
+def MakePuzzleWorker(Args):
+    return MakePuzzleLine(*Args)
+
+#A generator that never stops: it digs puzzles aiming for Difficulty (see
+#MakeRatedPuzzle) and yields each one (on one line) with its rating. They're
+#made by a pool of Workers processes (all the cores if None; with 1,
+#everything runs in this process), a few at a time, so there's never much
+#work going on that nobody will want, and they come out in the order of their
+#seeds. Each puzzle gets its own 64-bit seed, drawn from Seed, so a run is
+#repeatable, and runs with different seeds don't share puzzles.
+def GenerateRatedPuzzles(Difficulty = "Medium", BoxSize = 3, Workers = None, Seed = 0):
+    SeedMaker = random.Random(Seed)
+    if Workers is None:
+        Workers = os.cpu_count() or 1
+    if Workers == 1:
+        while True:
+            yield MakePuzzleLine(Difficulty, BoxSize, SeedMaker.getrandbits(64))
+    with multiprocessing.Pool(Workers) as Pool:
+        Pending = deque()
+        while True:
+            while len(Pending) < 4 * Workers:
+                Pending.append(Pool.apply_async(MakePuzzleWorker,
+                                                ((Difficulty, BoxSize, SeedMaker.getrandbits(64)),)))
+            yield Pending.popleft().get()
+
+#The file in Folder that keeps spare puzzles of one Difficulty, named like the
+#tiers in the Puzzles folder ("medium.txt", or "medium16.txt" for 16x16).
+def PoolPath(Folder, Difficulty, BoxSize = 3):
+    return os.path.join(Folder, Difficulty.lower() + ("" if BoxSize == 3 else str(BoxSize * BoxSize))
+                        + ".txt")
+
+#Takes up to Count puzzles out of a pool file, and returns them.
+def TakeFromPool(Path, Count):
+    if Count <= 0 or not os.path.exists(Path):
+        return []
+    with open(Path) as PoolFile:
+        Lines = [Line.strip() for Line in PoolFile if Line.strip() and not Line.startswith("#")]
+    with open(Path + ".new", "w") as PoolFile:
+        PoolFile.writelines(Line + "\n" for Line in Lines[Count:])
+    os.replace(Path + ".new", Path)
+    return Lines[:Count]
+
+#A generator that yields Count puzzles of the given Difficulty (on one line
+#each), from GenerateRatedPuzzles. Without a PoolFolder, the puzzles that come
+#out easier than wanted are thrown away, and for "Expert" that's nearly all
+#of them. With one, they're kept instead: each goes on the end of the pool
+#file for the difficulty it came out at (see PoolPath), and the puzzles this
+#asks for come out of the pool file for Difficulty first. So a run for hard
+#puzzles stocks up on easy ones for free, and a run for those that comes
+#along later may not need to dig at all. (Only one run at a time should use
+#a PoolFolder.)
+def GeneratePuzzles(Count, Difficulty = "Medium", BoxSize = 3, Workers = None, Seed = 0,
+                    PoolFolder = None):
+    if PoolFolder is not None:
+        os.makedirs(PoolFolder, exist_ok = True)
+        for Line in TakeFromPool(PoolPath(PoolFolder, Difficulty, BoxSize), Count):
+            yield Line
+            Count -= 1
+    if Count <= 0:
+        return
+    for Line, Rating in GenerateRatedPuzzles(Difficulty, BoxSize, Workers, Seed):
+        if Rating == Difficulty:
+            yield Line
+            Count -= 1
+            if Count == 0:
+                return
+        elif PoolFolder is not None:
+            with open(PoolPath(PoolFolder, Rating, BoxSize), "a") as PoolFile:
+                PoolFile.write(Line + "\n")
+
+def main():
+    Parser = argparse.ArgumentParser(description = "Make new Sudoku puzzles.")
+    Parser.add_argument("Count", type = int, help = "how many puzzles to make")
+    Parser.add_argument("-d", "--difficulty", default = "Medium", choices = Difficulties)
+    Parser.add_argument("-b", "--box-size", type = int, default = 3,
+                        help = "3 for 9x9 puzzles, 4 for 16x16 (default: 3)")
+    Parser.add_argument("-o", "--output", default = "-",
+                        help = "where to write the puzzles (default: stdout)")
+    Parser.add_argument("-w", "--workers", type = int, default = None,
+                        help = "number of worker processes (default: one per core)")
+    Parser.add_argument("-s", "--seed", type = int, default = 0,
+                        help = "runs with the same seed make the same puzzles")
+    Parser.add_argument("-p", "--pool",
+                        help = "folder to keep the puzzles that come out too easy in, one file "
+                               "per difficulty, and to take puzzles from first")
+    Args = Parser.parse_args()
+    Out = sys.stdout if Args.output == "-" else open(Args.output, "w")
+    try:
+        Out.write("# %d %s puzzles from SudokuGenerator.py (seed %d)\n"
+                  % (Args.Count, Args.difficulty, Args.seed))
+        for Line in GeneratePuzzles(Args.Count, Args.difficulty, Args.box_size,
+                                    Args.workers, Args.seed, Args.pool):
+            Out.write(Line + "\n")
+            Out.flush()
+    finally:
+        if Out is not sys.stdout:
+            Out.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+
+import SudokuBulk
+import SudokuSolver
+
+#A solving service that keeps running and takes puzzles from any number of
+#clients at once, over TCP or a Unix socket. The clients speak "JSON lines":
+#every request is a JSON object on a line of its own, and so is every answer.
+#A request looks like
+#  {"Id": 7, "Puzzle": "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......"}
+#and can also have an "Engine" (any engine SudokuBulk knows, "Deduction" if
+#left out) and a "Timeout" in seconds. The answer has the same Id and either a
+#"Solution" or an "Error" ("No solution", "Timed out", or whatever was wrong
+#with the request). Answers come back as soon as they're ready, which isn't
+#always the order the requests went in, hence the Id.
+#  {"Id": 8, "Command": "Stats"}
+#gets back the queue depth and latency percentiles (see SolveServer.Stats).
+
+#Inside, requests go on a queue of limited length, and a fixed set of worker
+#processes take them off it one at a time. When the queue is full, the server
+#stops reading from the client that's sending, which makes the client's own
+#writes block, rather than letting a backlog build up that nobody will wait
+#for. A puzzle that's already queued or being solved isn't queued again: the
+#new request just waits for the same answer. If everyone waiting for a puzzle
+#gives up on it, it's dropped from the queue, or if it's already being solved,
+#the worker solving it is killed and a fresh one takes its place. The same
+#happens to any solve that takes longer than MaxSolveSeconds.
+
+#The workers are made by a fork server (or started from scratch where there
+#isn't one), never forked from the server itself: a forked worker would keep
+#a copy of every socket the server has open, so a client whose connection
+#the server closes would never see it close while that worker lived. The
+#fork server starts with the first worker, before the server is listening,
+#and already has the solver imported, so replacing a worker is still quick.
+if "forkserver" in multiprocessing.get_all_start_methods():
+    Context = multiprocessing.get_context("forkserver")
+    Context.set_forkserver_preload(["SudokuBulk"])
+else:
+    Context = multiprocessing.get_context("spawn")
+
+#One worker process, with a pipe to talk to it over. It can be killed and
+#replaced at any time, which is the only way to stop a solve part way.
+class SolverWorker(object):
+    def __init__(self):
+        self.Start()
+
+    def Start(self):
+        self.Conn, Child = Context.Pipe()
+        self.Process = Context.Process(target = WorkerMain, args = (Child,), daemon = True)
+        self.Process.start()
+        Child.close()
+
+    def Restart(self):
+        self.Process.kill()
+        self.Process.join()
+        self.Conn.close()
+        self.Start()
+
+    #Sends the worker a puzzle line and waits (without holding up anybody
+    #else) for the solution line, or None.
+    async def Solve(self, Line, Engine):
+        self.Conn.send((Line, Engine))
+        Loop = asyncio.get_running_loop()
+        Ready = Loop.create_future()
+        def WakeUp():
+            if not Ready.done():
+                Ready.set_result(None)
+        #(Kept, since by the time this is cancelled, self.Conn may be a new
+        #worker's)
+        Fd = self.Conn.fileno()
+        Loop.add_reader(Fd, WakeUp)
+        try:
+            await Ready
+        finally:
+            Loop.remove_reader(Fd)
+        return self.Conn.recv()
+
+#What a worker process runs: solves puzzles as they come in until the pipe
+#closes.
+def WorkerMain(Conn):
+    while True:
+        try:
+            Line, Engine = Conn.recv()
+        except EOFError:
+            return
+        Conn.send(SudokuBulk.SolveChunk([Line], Engine)[0])
+
+#A puzzle that's queued or being solved. Result gets the solution line (or
+#None) when there is one. Waiters is how many requests want it.
+class Job(object):
+    def __init__(self, Line, Engine):
+        self.Line = Line
+        self.Engine = Engine
+        self.Result = asyncio.get_running_loop().create_future()
+        self.Waiters = 0
+
+class SolveServer(object):
+    def __init__(self, Workers = None, QueueSize = 1000, Timeout = 10.0, MaxSolveSeconds = 30.0):
+        self.WorkerCount = Workers or os.cpu_count() or 1
+        self.QueueSize = QueueSize
+        self.Timeout = Timeout
+        self.MaxSolveSeconds = MaxSolveSeconds
+        self.Queue = None
+        self.Workers = []
+        self.Dispatchers = []
+        #The Jobs queued or being solved, by (puzzle line, engine)
+        self.InFlight = {}
+        #How long the latest requests took to answer, in seconds
+        self.Latencies = deque(maxlen = 10000)
+        self.Counts = {"Requests": 0, "Solved": 0, "NoSolution": 0, "TimedOut": 0,
+                       "Coalesced": 0, "Killed": 0, "BadRequests": 0}
+
+    #Starts the worker processes, each with a task to feed it from the queue.
+    async def Start(self):
+        self.Queue = asyncio.Queue(self.QueueSize)
+        for w in range(self.WorkerCount):
+            Worker = SolverWorker()
+            self.Workers.append(Worker)
+            self.Dispatchers.append(asyncio.ensure_future(self.Dispatch(Worker)))
+
+    async def Stop(self):
+        for Dispatcher in self.Dispatchers:
+            Dispatcher.cancel()
+        await asyncio.gather(*self.Dispatchers, return_exceptions = True)
+        for Worker in self.Workers:
+            Worker.Process.kill()
+            Worker.Process.join()
+
+    #Feeds one worker, one Job at a time, for as long as the server runs.
+    async def Dispatch(self, Worker):
+        while True:
+            TheJob = await self.Queue.get()
+            if TheJob.Result.done():
+                #Everyone gave up on it while it was queued
+                continue
+            Solving = asyncio.ensure_future(Worker.Solve(TheJob.Line, TheJob.Engine))
+            await asyncio.wait([Solving, TheJob.Result], timeout = self.MaxSolveSeconds,
+                               return_when = asyncio.FIRST_COMPLETED)
+            if Solving.done() and Solving.exception() is None:
+                if not TheJob.Result.done():
+                    TheJob.Result.set_result(Solving.result())
+                continue
+            #Taking too long, nobody wants it any more, or the worker died
+            #(Waiting for the cancel to go through, so that Solve stops
+            #watching the old pipe before it's closed)
+            Solving.cancel()
+            await asyncio.gather(Solving, return_exceptions = True)
+            Worker.Restart()
+            self.Counts["Killed"] += 1
+            if not TheJob.Result.done():
+                TheJob.Result.set_exception(asyncio.TimeoutError())
+
+    #Finds the Job for a puzzle, or queues a new one, waiting for room on the
+    #queue if need be.
+    async def Submit(self, Line, Engine):
+        Key = (Line, Engine)
+        TheJob = self.InFlight.get(Key)
+        #(A Job that was just cancelled may not be out of InFlight yet)
+        if TheJob is None or TheJob.Result.done():
+            TheJob = Job(Line, Engine)
+            self.InFlight[Key] = TheJob
+            TheJob.Result.add_done_callback(lambda Result: self.InFlight.pop(Key, None))
+            await self.Queue.put(TheJob)
+        else:
+            self.Counts["Coalesced"] += 1
+        TheJob.Waiters += 1
+        return TheJob
+
+    #Waits up to Timeout seconds for a Job's solution. The last one to stop
+    #waiting, however that happens, cancels the Job.
+    async def Wait(self, TheJob, Timeout):
+        try:
+            return await asyncio.wait_for(asyncio.shield(TheJob.Result), Timeout)
+        finally:
+            TheJob.Waiters -= 1
+            if TheJob.Waiters == 0 and not TheJob.Result.done():
+                TheJob.Result.cancel()
+
+    #The answer to a Stats request: how many requests are queued and being
+    #solved, how the requests have gone, and the 50th, 90th and 99th
+    #percentile and the worst of the latest answer times, in milliseconds.
+    def Stats(self):
+        Times = sorted(self.Latencies)
+        def Percentile(p):
+            return 1000 * Times[min(len(Times) - 1, int(len(Times) * p))] if Times else None
+        return {"QueueDepth": self.Queue.qsize(),
+                "InFlight": len(self.InFlight),
+                "Workers": self.WorkerCount,
+                "Counts": dict(self.Counts),
+                "LatencyMs": {"P50": Percentile(0.5), "P90": Percentile(0.9),
+                              "P99": Percentile(0.99), "Max": Percentile(1.0)}}
+
+    #Talks to one client until it hangs up.
+    async def HandleClient(self, Reader, Writer):
+        Lock = asyncio.Lock()
+        Answers = set()
+        try:
+            while True:
+                Line = await Reader.readline()
+                if not Line:
+                    break
+                Start = time.perf_counter()
+                Request = None
+                try:
+                    Request = json.loads(Line)
+                    if not isinstance(Request, dict):
+                        raise ValueError("A request has to be a JSON object")
+                    if Request.get("Command") == "Stats":
+                        await self.Send(Writer, Lock, dict(self.Stats(), Id = Request.get("Id")))
+                        continue
+                    Engine = Request.get("Engine", "Deduction")
+                    if Engine not in ("Deduction", "DancingLinks", "Batch"):
+                        raise ValueError("Unknown engine: " + str(Engine))
+                    Numbers = SudokuSolver.ReadNumbers(str(Request.get("Puzzle", "")))
+                    #(float() raises TypeError for a null, a list or an object)
+                    try:
+                        Timeout = float(Request.get("Timeout", self.Timeout))
+                    except TypeError:
+                        Timeout = None
+                    if Timeout is None or not 0 < Timeout < float("inf"):
+                        raise ValueError("Timeout has to be a positive number of seconds")
+                except ValueError as Error:
+                    self.Counts["BadRequests"] += 1
+                    Id = Request.get("Id") if isinstance(Request, dict) else None
+                    await self.Send(Writer, Lock, {"Id": Id, "Error": str(Error)})
+                    continue
+                self.Counts["Requests"] += 1
+                Puzzle = "".join(SudokuSolver.Symbols[n - 1] if n else "." for n in Numbers)
+                TheJob = await self.Submit(Puzzle, Engine)
+                Answer = asyncio.ensure_future(self.Answer(TheJob, Request.get("Id"), Timeout,
+                                                           Start, Writer, Lock))
+                Answers.add(Answer)
+                Answer.add_done_callback(Answers.discard)
+            #The client has sent everything; finish answering it
+            await asyncio.gather(*Answers, return_exceptions = True)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            for Answer in Answers:
+                Answer.cancel()
+            Writer.close()
+
+    #Waits for one request's solution and sends it back.
+    async def Answer(self, TheJob, Id, Timeout, Start, Writer, Lock):
+        try:
+            Solution = await self.Wait(TheJob, Timeout)
+        except asyncio.TimeoutError:
+            self.Counts["TimedOut"] += 1
+            Reply = {"Id": Id, "Error": "Timed out"}
+        else:
+            if Solution is None:
+                self.Counts["NoSolution"] += 1
+                Reply = {"Id": Id, "Error": "No solution"}
+            else:
+                self.Counts["Solved"] += 1
+                Reply = {"Id": Id, "Solution": Solution}
+        self.Latencies.append(time.perf_counter() - Start)
+        try:
+            await self.Send(Writer, Lock, Reply)
+        except ConnectionError:
+            pass
+
+    async def Send(self, Writer, Lock, Reply):
+        async with Lock:
+            Writer.write((json.dumps(Reply) + "\n").encode())
+            await Writer.drain()
+
+async def Serve(Host, Port, UnixPath, Workers, QueueSize, Timeout, MaxSolveSeconds):
+    Server = SolveServer(Workers, QueueSize, Timeout, MaxSolveSeconds)
+    await Server.Start()
+    if UnixPath:
+        Listener = await asyncio.start_unix_server(Server.HandleClient, UnixPath)
+    else:
+        Listener = await asyncio.start_server(Server.HandleClient, Host, Port)
+    try:
+        async with Listener:
+            await Listener.serve_forever()
+    finally:
+        await Server.Stop()
+
+def main():
+    Parser = argparse.ArgumentParser(description = "Run a Sudoku solving service (JSON lines).")
+    Parser.add_argument("--host", default = "127.0.0.1")
+    Parser.add_argument("-p", "--port", type = int, default = 8765)
+    Parser.add_argument("-u", "--unix", help = "listen on this Unix socket instead of TCP")
+    Parser.add_argument("-w", "--workers", type = int, default = None,
+                        help = "number of worker processes (default: one per core)")
+    Parser.add_argument("-q", "--queue-size", type = int, default = 1000,
+                        help = "how many puzzles can wait for a worker")
+    Parser.add_argument("-t", "--timeout", type = float, default = 10.0,
+                        help = "seconds a request waits for its solution, unless it says otherwise")
+    Parser.add_argument("--max-solve-seconds", type = float, default = 30.0,
+                        help = "a solve taking longer than this gets its worker killed")
+    Args = Parser.parse_args()
+    try:
+        asyncio.run(Serve(Args.host, Args.port, Args.unix, Args.workers, Args.queue_size,
+                          Args.timeout, Args.max_solve_seconds))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
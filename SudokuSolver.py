@@ -1,8 +1,15 @@
-import numpy as np
+from functools import partial
+from itertools import combinations
+from array import array
+import sys
+from time import perf_counter
 
-#This is a Sudoku solver that works for most puzzles, but it can't yet break
-#the toughest. It uses simple recursion to execute a two-step cycle which repeats
-#again and again until the grid is full:
+import DancingLinks
+
+#This is a Sudoku solver that works for most puzzles by logic alone, and falls
+#back on guessing (see BacktrackSolve) for the toughest. It uses simple
+#recursion to execute a two-step cycle which repeats again and again until the
+#grid is full:
 
 #Step 1) Enumerate all the possible numbers that could fit into each empty
 #cell, based on the information known (i.e., the numbers in all the other
@@ -17,6 +24,13 @@ import numpy as np
 #for options, so that all these solutions can be implemented at once, ready for
 #the next round of option-checking.
 
+#That cycle is still here (GetAllOptions and FillAllNumbers), but the actual
+#solving now works the other way around: placing a number only updates the 20
+#cells that can see it, and only the cells and groups that changed are looked
+#at again (see Grid.StartPropagation and the methods after it). When that runs
+#dry, Grid.DeduceAll brings in the heavier solving techniques listed in
+#AllTechniques, and only then does it come down to guessing.
+
 #In the Option-checking step (Grid.GetAllOptions), there's a thing called
 #HandleGhostNumbers. It was the toughest part to write, and it's still messy,
 #with awkward variables and an inefficient algorithm. I was hoping this part
@@ -26,37 +40,239 @@ import numpy as np
 #But it shouldn't give any incorrect solutions. See that section to learn more
 #about what it actually does.
 
+#Options and Eliminations used to be strings like "1356", which meant that
+#every check was a string search and every elimination was a string replace.
+#Now each Cell keeps an integer "Mask" instead: bit 0 stands for 1, bit 1 for
+#2, and so on up to bit 8 for 9. So the Options "1356" are the Mask
+#0b000110101. Taking options away is just Mask & ~Eliminations, and asking
+#whether an option appears anywhere in a group of cells is just an OR of their
+#Masks. The Options and Eliminations strings are still there for anyone who
+#wants to read them, but they're worked out from the Masks on demand.
+
+#Grids don't have to be 9x9, either. A grid is made of BoxSize x BoxSize
+#blocks, and has BoxSize x BoxSize of them, so a BoxSize of 3 is the usual
+#9x9 grid, 4 makes a 16x16 grid and 5 a 25x25 grid. Numbers above 9 are
+#written as letters (A for 10, B for 11, and so on), taken from Symbols.
+Symbols = "123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+#This module only uses the standard library (and DancingLinks.py) when it's
+#imported, so that running it, or anything built on it, for one puzzle at a
+#time doesn't mean waiting for NumPy to load, which takes far longer than
+#solving does. NumPy gets imported the first time something asks for
+#Grid.Cells, which is a NumPy array; the solving itself never needs it. (See
+#SudokuBenchmark.py --startup for how long the import takes.)
+
+#Everything about the layout of a grid of a given BoxSize, worked out once
+#instead of every time it's needed:
+#  - Digits, the numbers that can go in the grid, and FullMask, the Mask with
+#    all of them
+#  - DigitBit, which turns a Number (including the empty " ") into its bit
+#  - Units, the groups of Cells that each need every number once. Cells are
+#    numbered row by row, so in a 9x9 grid Cell (r,c) is number r*9+c, and
+#    units 0-8 are the rows, 9-17 the columns and 18-26 the blocks.
+#  - CellUnits, the 3 units of each Cell
+#  - Peers, the other Cells that share at least one unit with each Cell (20
+#    of them in a 9x9 grid)
+#  - BlockCoordsTable, the coordinates of the Cells in each block
+#  - Intersections, one for every place where a block crosses a row or a
+#    column: the Cells in both, the rest of the block and the rest of the
+#    line (see PointingAndClaiming)
+#  - where everything goes on the Board of a Grid (see Grid), and CountBases,
+#    the place on the Board where the option counts of each of a Cell's 3
+#    units start
+#Don't make these yourself; ShapeOf hands out one per BoxSize.
+class Shape(object):
+    def __init__(self, BoxSize):
+        if not 2 <= BoxSize <= 5:
+            raise ValueError("BoxSize has to be between 2 and 5")
+        B = BoxSize
+        Size = B * B
+        self.BoxSize = B
+        self.Size = Size
+        self.CellCount = Size * Size
+        self.Digits = Symbols[:Size]
+        self.FullMask = (1 << Size) - 1
+        self.DigitBit = {" ": 0}
+        for i in range(Size):
+            self.DigitBit[self.Digits[i]] = 1 << i
+        self.Units = ([[r * Size + c for c in range(Size)] for r in range(Size)]
+                      + [[r * Size + c for r in range(Size)] for c in range(Size)]
+                      + [[(br + r) * Size + bc + c for r in range(B) for c in range(B)]
+                         for br in range(0, Size, B) for bc in range(0, Size, B)])
+        self.CellUnits = [(i // Size, Size + i % Size,
+                           2 * Size + (i // (Size * B)) * B + (i % Size) // B)
+                          for i in range(self.CellCount)]
+        self.Peers = [sorted(set(self.Units[u[0]] + self.Units[u[1]] + self.Units[u[2]]) - {i})
+                      for i, u in enumerate(self.CellUnits)]
+        self.BlockCoordsTable = [[[i // Size, i % Size] for i in self.Units[2 * Size + b]]
+                                 for b in range(Size)]
+        self.Intersections = []
+        for b in range(Size):
+            Block = self.Units[2 * Size + b]
+            for u in sorted(set(u for i in Block for u in self.CellUnits[i][:2])):
+                Both = [i for i in Block if i in self.Units[u]]
+                self.Intersections.append((Both,
+                                           [i for i in Block if i not in Both],
+                                           [i for i in self.Units[u] if i not in Both]))
+        self.NumberStart = self.CellCount
+        self.UsedStart = 2 * self.CellCount
+        self.CountStart = self.UsedStart + 3 * Size
+        self.EmptyAt = self.CountStart + 3 * Size * Size
+        self.BoardLength = self.EmptyAt + 1
+        self.CountBases = [tuple(self.CountStart + u * Size for u in Units3)
+                           for Units3 in self.CellUnits]
+
+    #Turns an Options (or Eliminations) string into a Mask.
+    def MaskFromString(self, Options):
+        Mask = 0
+        for o in Options:
+            Mask |= self.DigitBit[o]
+        return Mask
+
+    #Turns a Mask back into an Options string.
+    def MaskToString(self, Mask):
+        return "".join(self.Digits[i] for i in range(self.Size) if Mask >> i & 1)
+
+Shapes = {}
+
+def ShapeOf(BoxSize):
+    if BoxSize not in Shapes:
+        Shapes[BoxSize] = Shape(BoxSize)
+    return Shapes[BoxSize]
+
+#The tables of the usual 9x9 grid, under the names they've always had.
+Classic = ShapeOf(3)
+Digits = Classic.Digits
+FullMask = Classic.FullMask
+DigitBit = Classic.DigitBit
+Units = Classic.Units
+CellUnits = Classic.CellUnits
+Peers = Classic.Peers
+BlockCoordsTable = Classic.BlockCoordsTable
+
+#Counts the Options in a Mask. int.bit_count is the fastest way, but it only
+#exists from Python 3.10 on.
+if hasattr(int, "bit_count"):
+    CountOptions = int.bit_count
+else:
+    def CountOptions(Mask):
+        return bin(Mask).count("1")
+
+#Keeps track of what the solver did, for when you want to know why a puzzle
+#took as long as it did. Give one to RecursiveSolve (or set a Grid's Stats to
+#one) and it fills up with:
+#  - Eliminations, Placements, Times and Calls: for each step of the solving,
+#    by name, how many Options it took away, how many Numbers it placed, how
+#    many seconds it took and how many times it ran. The steps are "Singles"
+#    (Propagate), the techniques in AllTechniques, "Dancing Links", and the
+#    parts of the old two-step cycle (GetAllOptions and FillAllNumbers).
+#  - Sweeps: how many rounds DeduceAll (or the two-step cycle) went through
+#  - Guesses and Backtracks: how many guesses GuessSolve made, and how many of
+#    them it had to take back
+#If Callback is given, it gets called as Callback(Event, Details) every time
+#something happens, with Event one of "Step", "Guess" or "Backtrack" and
+#Details a dictionary saying what. The same SolveStats can be used for any
+#number of puzzles, and just keeps adding up.
+#A Grid without Stats (the usual) skips all of this, so it costs nothing.
+class SolveStats(object):
+    def __init__(self, Callback = None):
+        self.Callback = Callback
+        self.Eliminations = {}
+        self.Placements = {}
+        self.Times = {}
+        self.Calls = {}
+        self.Sweeps = 0
+        self.Guesses = 0
+        self.Backtracks = 0
+
+    #Adds one run of the step called Name.
+    def Record(self, Name, Seconds, Eliminated, Placed):
+        self.Eliminations[Name] = self.Eliminations.get(Name, 0) + Eliminated
+        self.Placements[Name] = self.Placements.get(Name, 0) + Placed
+        self.Times[Name] = self.Times.get(Name, 0.0) + Seconds
+        self.Calls[Name] = self.Calls.get(Name, 0) + 1
+        self.Event("Step", {"Name": Name, "Seconds": Seconds,
+                            "Eliminated": Eliminated, "Placed": Placed})
+
+    #Passes an event on to the Callback, if there is one.
+    def Event(self, Event, Details):
+        if self.Callback is not None:
+            self.Callback(Event, Details)
+
+    #Everything collected so far, as a dictionary that's ready to be saved as
+    #JSON.
+    def AsDict(self):
+        return {"Eliminations": dict(self.Eliminations),
+                "Placements": dict(self.Placements),
+                "Times": dict(self.Times),
+                "Calls": dict(self.Calls),
+                "Sweeps": self.Sweeps,
+                "Guesses": self.Guesses,
+                "Backtracks": self.Backtracks}
+
 #Some methods relating to an individual cell appear under the Grid class, rather
 #than here, because they need to refer to other cells in the grid.
+#A Cell doesn't hold its own Number and Mask any more. It's a window onto one
+#place on the Board of its Grid (see Grid), so changing the Cell changes the
+#Board and the other way around. A Cell that isn't in a Grid yet gets a
+#little Board of its own, until a Grid takes it over with Attach.
 class Cell(object):
-    def __init__(self, Row, Col, Number, Options, Eliminations):
+    def __init__(self, Row, Col, Number, Options, Eliminations, BoxSize = 3):
+        self.Shape = ShapeOf(BoxSize)
         self.Row = Row
         self.Col = Col
+        self.Block = (Row // BoxSize) * BoxSize + Col // BoxSize
+        self.Board = [0, 0]
+        self.Index = 0
+        self.NumberAt = 1
         self.Number = Number
-        self.Options = Options
-        self.Eliminations = Eliminations
+        self.Mask = self.Shape.MaskFromString(Options)
+        self.EliminationMask = self.Shape.MaskFromString(Eliminations)
+
+    #Makes the Cell a window onto Cell number Index of Board.
+    def Attach(self, Board, Index):
+        self.Board = Board
+        self.Index = Index
+        self.NumberAt = self.Shape.NumberStart + Index
+
+    @property
+    def Number(self):
+        n = self.Board[self.NumberAt]
+        return self.Shape.Digits[n - 1] if n else " "
+
+    @Number.setter
+    def Number(self, Number):
+        self.Board[self.NumberAt] = self.Shape.DigitBit[Number].bit_length()
+
+    @property
+    def Mask(self):
+        return self.Board[self.Index]
 
-    #Returns the coordinates of all 9 cells in the local 3x3 block
+    @Mask.setter
+    def Mask(self, Mask):
+        self.Board[self.Index] = Mask
+
+    #The old string versions of Mask and EliminationMask.
+    @property
+    def Options(self):
+        return self.Shape.MaskToString(self.Mask)
+
+    @Options.setter
+    def Options(self, Options):
+        self.Mask = self.Shape.MaskFromString(Options)
+
+    @property
+    def Eliminations(self):
+        return self.Shape.MaskToString(self.EliminationMask)
+
+    @Eliminations.setter
+    def Eliminations(self, Eliminations):
+        self.EliminationMask = self.Shape.MaskFromString(Eliminations)
+
+    #Returns the coordinates of all the cells in the local block (the same
+    #list every time, so please don't change it)
     def BlockCoords(self):
-        BRows = []
-        BCols = []
-        BlockCoords = []
-        if 0 <= self.Row <= 2:
-            BRows = [0,1,2]
-        elif 3 <= self.Row <= 5:
-            BRows = [3,4,5]
-        else:
-            BRows = [6,7,8]
-        if 0 <= self.Col <= 2:
-            BCols = [0,1,2]
-        elif 3 <= self.Col <= 5:
-            BCols = [3,4,5]
-        else:
-            BCols = [6,7,8]
-        for r in BRows:
-            for c in BCols:
-                BlockCoords.append([r,c])
-        return BlockCoords
+        return self.Shape.BlockCoordsTable[self.Block]
     
     #Returns True if the cell has already been filled with a number
     def IsCellFull(self):
@@ -65,54 +281,239 @@ class Cell(object):
         else:
             return True
 
-#A Grid is a NumPy array of Cells (with dtype = Cell)
+#A Grid is a NumPy array of Cells (with dtype = Cell), 9x9 or whatever size
+#its Cells' Shape says. It also keeps a "used" Mask for every row, column and
+#block, which holds the Numbers already placed there, and two tallies of the
+#Options in each of them (see TallyOptions).
+#Underneath, everything the solving changes lives in one flat list of
+#integers, the Board, and the Cells are only windows onto it. With N Cells
+#(81 in a 9x9 grid) and Size numbers, the Board holds:
+#  - the Mask of each Cell, at 0 to N-1 (so Board[i] is the Mask of Cell i)
+#  - the Number of each Cell, from Shape.NumberStart on (0 for an empty Cell,
+#    otherwise 1 to Size)
+#  - UnitUsed, the Numbers already in each unit, from Shape.UsedStart on
+#  - OptionCount (see StartPropagation), from Shape.CountStart on
+#  - EmptyCount, the number of empty Cells, at Shape.EmptyAt
+#So a copy of the Board is a copy of the whole state of the grid, made in one
+#go (see Snapshot), and handing a puzzle to another process only takes its
+#Masks and Numbers as one array of integers (see PackBoard).
+#A Grid is made either from Cells, or from Board, a list (or anything else
+#that can be sliced, like a memoryview) of the N Masks followed by the N
+#Numbers. Made from a Board, it doesn't bother making any Cells until someone
+#asks for them.
 class Grid(object):
-    def __init__(self, Cells):
-        self.Cells = Cells
+    def __init__(self, Cells = None, Board = None):
+        if Cells is not None:
+            CellList = list(Cells.flat)
+            self.Shape = CellList[0].Shape
+            Board = ([TheCell.Mask for TheCell in CellList]
+                     + [TheCell.Shape.DigitBit[TheCell.Number].bit_length() for TheCell in CellList])
+        else:
+            BoxSize = int(round((len(Board) / 2) ** 0.25))
+            self.Shape = ShapeOf(BoxSize)
+            CellList = None
+        N = self.Shape.CellCount
+        if len(Board) != 2 * N:
+            raise ValueError("A Board has to hold " + str(N) + " Masks and " + str(N) + " Numbers")
+        self.Board = [int(x) for x in Board[:2 * N]] + [0] * (self.Shape.BoardLength - 2 * N)
+        self.CellArray = Cells
+        self.CellViews = CellList
+        if CellList is not None:
+            for i in range(N):
+                CellList[i].Attach(self.Board, i)
+        Size = self.Shape.Size
+        self.RowUsed = [0] * Size
+        self.ColUsed = [0] * Size
+        self.BlockUsed = [0] * Size
+        self.RowOnce = [0] * Size
+        self.ColOnce = [0] * Size
+        self.BlockOnce = [0] * Size
+        self.RowTwice = [0] * Size
+        self.ColTwice = [0] * Size
+        self.BlockTwice = [0] * Size
+        self.RefreshUsedMasks()
+        #The to-do lists used by StartPropagation, Place and Propagate
+        self.Singles = []
+        self.Hiddens = []
+        #True once StartPropagation has set up the counts and to-do lists, for
+        #as long as they stay right (see IterSolve)
+        self.Started = False
+        #How many times Propagate has run on this Grid (see SudokuBenchmark)
+        self.Passes = 0
+        #A SolveStats to keep track of the solving in, if anyone wants that
+        self.Stats = None
+    
+    #The Cells, as a Size x Size NumPy array, made the first time they're
+    #needed.
+    @property
+    def Cells(self):
+        if self.CellArray is None:
+            import numpy as np
+            Size = self.Shape.Size
+            Cells = np.empty((Size,Size), dtype=Cell)
+            for i, TheCell in enumerate(self.CellList):
+                Cells[i // Size, i % Size] = TheCell
+            self.CellArray = Cells
+        return self.CellArray
+    
+    #The Cells in the order of the unit tables, as a plain list (which, unlike
+    #Cells, doesn't need NumPy)
+    @property
+    def CellList(self):
+        if self.CellViews is None:
+            Size = self.Shape.Size
+            CellList = []
+            for i in range(self.Shape.CellCount):
+                TheCell = Cell(i // Size, i % Size, " ", "", "", self.Shape.BoxSize)
+                TheCell.Attach(self.Board, i)
+                CellList.append(TheCell)
+            self.CellViews = CellList
+        return self.CellViews
+    
+    @property
+    def EmptyCount(self):
+        return self.Board[self.Shape.EmptyAt]
+    
+    #The Masks and Numbers of the grid (the first half of the Board, which is
+    #all that's needed to make it again) packed into an array of 32-bit
+    #integers. To share a grid between processes without pickling anything,
+    #copy this into a multiprocessing.shared_memory block, and have the other
+    #process make its Grid with Board = Block.buf.cast("i"). (The Grid still
+    #works on a list of its own, because Python reads and writes a list about
+    #twice as fast as it does an array.)
+    def PackBoard(self):
+        return array("i", self.Board[:2 * self.Shape.CellCount])
+    
+    #Pickles a Grid as just its Board, rather than a few hundred objects.
+    def __getstate__(self):
+        return (self.PackBoard().tobytes(), self.Board[2 * self.Shape.CellCount:],
+                self.Singles, self.Hiddens, self.Passes)
+    
+    def __setstate__(self, State):
+        Packed, Rest, Singles, Hiddens, Passes = State
+        self.__init__(Board = memoryview(Packed).cast("i"))
+        self.Board[2 * self.Shape.CellCount:] = Rest
+        self.Singles = Singles
+        self.Hiddens = Hiddens
+        self.Passes = Passes
     
     #A method that refreshes the Options list for each Cell. Note that
     #HandleGhostNumbers appears here, and so would a lot of other methods
     #if I had the audacity to try and code for more solution techniques.
     #I don't, and I have a lot of audacity.
     def GetAllOptions(self):
-        self.HandleGhostNumbers()
-        for r in range(9):
-            for c in range(9):
-                self.Cells[r,c].Options = self.GetCellOptions(self.Cells[r,c])
+        self.Started = False
+        if self.Stats is not None:
+            self.Stats.Sweeps += 1
+        self.RunStep("RefreshUsedMasks", self.RefreshUsedMasks)
+        self.RunStep("HandleGhostNumbers", self.HandleGhostNumbers)
+        self.RunStep("GetCellOptions", self.GetEveryCellsOptions)
+        self.RunStep("TallyOptions", self.TallyOptions)
+    
+    def GetEveryCellsOptions(self):
+        for TheCell in self.CellList:
+            self.GetCellOptions(TheCell)
     
     #A method that fills each Cell with a number, if possible.
     #(See FillCellNumber, which processes the individual Cell.)
     def FillAllNumbers(self):
-        for r in range(9):
-            for c in range(9):
-                self.Cells[r,c].Number = self.FillCellNumber(self.Cells[r,c])
+        self.Started = False
+        self.RunStep("FillAllNumbers", self.FillEveryCellsNumber)
+    
+    def FillEveryCellsNumber(self):
+        for TheCell in self.CellList:
+            TheCell.Number = self.FillCellNumber(TheCell)
+    
+    #Runs one step of the solving, Function(*Args), and returns whatever it
+    #returns. Without Stats that's all. With Stats, it also times the step and
+    #works out how many Options it took away from Cells that are still empty
+    #and how many Cells it filled, and records them under Name.
+    def RunStep(self, Name, Function, *Args):
+        Stats = self.Stats
+        if Stats is None:
+            return Function(*Args)
+        N = self.Shape.CellCount
+        Before = self.Board[:2 * N]
+        Start = perf_counter()
+        Result = Function(*Args)
+        Seconds = perf_counter() - Start
+        Board = self.Board
+        Eliminated = 0
+        Placed = 0
+        for i in range(N):
+            if not Board[N + i]:
+                Eliminated += CountOptions(Before[i] & ~Board[i])
+            elif not Before[N + i]:
+                Placed += 1
+        Stats.Record(Name, Seconds, Eliminated, Placed)
+        return Result
+    
+    #Rebuilds the used Masks of every row, column and block from the Numbers in
+    #the grid (whether they were there from the beginning or were logically
+    #deduced and implemented in FillAllNumbers).
+    def RefreshUsedMasks(self):
+        Size = self.Shape.Size
+        CellUnits = self.Shape.CellUnits
+        Numbers = self.Board[self.Shape.NumberStart:self.Shape.UsedStart]
+        RowUsed = [0] * Size
+        ColUsed = [0] * Size
+        BlockUsed = [0] * Size
+        for i in range(self.Shape.CellCount):
+            if Numbers[i]:
+                Bit = 1 << (Numbers[i] - 1)
+                r, c, b = CellUnits[i]
+                RowUsed[r] |= Bit
+                ColUsed[c - Size] |= Bit
+                BlockUsed[b - 2 * Size] |= Bit
+        self.RowUsed = RowUsed
+        self.ColUsed = ColUsed
+        self.BlockUsed = BlockUsed
+    
+    #Counts which options turn up at least once ("Once") and at least twice
+    #("Twice") in each row, column and block. With those, FillCellNumber can
+    #tell whether an option appears anywhere else in a group without looking
+    #at the other cells: it does if it's in Twice, or if it's in Once but not
+    #in the cell itself.
+    def TallyOptions(self):
+        Size = self.Shape.Size
+        RowOnce = [0] * Size
+        ColOnce = [0] * Size
+        BlockOnce = [0] * Size
+        RowTwice = [0] * Size
+        ColTwice = [0] * Size
+        BlockTwice = [0] * Size
+        for TheCell in self.CellList:
+            Mask = TheCell.Mask
+            r = TheCell.Row
+            c = TheCell.Col
+            b = TheCell.Block
+            RowTwice[r] |= RowOnce[r] & Mask
+            RowOnce[r] |= Mask
+            ColTwice[c] |= ColOnce[c] & Mask
+            ColOnce[c] |= Mask
+            BlockTwice[b] |= BlockOnce[b] & Mask
+            BlockOnce[b] |= Mask
+        self.RowOnce = RowOnce
+        self.ColOnce = ColOnce
+        self.BlockOnce = BlockOnce
+        self.RowTwice = RowTwice
+        self.ColTwice = ColTwice
+        self.BlockTwice = BlockTwice
     
-    #This function takes a single cell and shortens its Options string based
-    #on the Numbers in the grid (whether they were there from the beginning or
-    #were logically deduced and implemented in FillAllNumbers).
+    #This function takes a single cell and shortens its Options based on the
+    #used Masks of its column, row, and block. Any Number in one of those is an
+    #Elimination, and taking all the Eliminations out of the Options is a
+    #single AND.
     def GetCellOptions(self, TheCell):
         self.TheCell = TheCell
-        TheCell.Eliminations = ""
         if not TheCell.IsCellFull():
-            #Enumerate invalid options by checking columns, rows, and blocks
-            for r in range(9):
-                TheCell.Eliminations += self.Cells[r,TheCell.Col].Number
-            for c in range(9):
-                TheCell.Eliminations += self.Cells[TheCell.Row,c].Number
-            BC = TheCell.BlockCoords()
-            for b in range(9):
-                TheCell.Eliminations += self.Cells[BC[b][0],BC[b][1]].Number
-            #Trim out the spaces (the Number value for an empty cell is " ")
-            TheCell.Eliminations = TheCell.Eliminations.replace(" ","")
-
-            #Makes sure that none of the eliminations appear in the options.
-            for x in range(len(TheCell.Options)):
-                if TheCell.Options[x] in TheCell.Eliminations:
-                    TheCell.Options = TheCell.Options.replace(TheCell.Options[x]," ")
-            #Trim out the spaces
-            TheCell.Options = TheCell.Options.replace(" ","")
+            TheCell.EliminationMask = (self.RowUsed[TheCell.Row]
+                                       | self.ColUsed[TheCell.Col]
+                                       | self.BlockUsed[TheCell.Block])
+            TheCell.Mask &= ~TheCell.EliminationMask
         else:
-            TheCell.Options = ""
+            TheCell.EliminationMask = 0
+            TheCell.Mask = 0
         return TheCell.Options
     
     #This is really clunky. And even after writing it, I realized that there's
@@ -132,271 +533,892 @@ class Grid(object):
     #This method takes each 3x3 block and runs it through 6 main processes. The
     #first three check the three intersections between a row and that block (so
     #three horizontal rows of three cells each). For each of these three "mini-
-    #rows," it checks to see if any options in those cells (RowInBlockOpts) also
-    #appear elsewhere in the block (OtherRowsInBlockOpts). If a certain number
-    #does not, and if the number in question hasn't after all been assigned as
-    #the solution anywhere in the block, then it goes ahead and eliminates that
-    #option from the rest of its row OUTSIDE the block, like in my ghost story
-    #above. The next 3 main processes (I said there were 6, remember?) do
-    #exactly the same thing except vertically, with the columns.
+    #rows," it ORs together the Masks of those cells (MiniRowOpts) and of the
+    #other six cells in the block (OtherRowsInBlockOpts). Any option in the
+    #first but not in the second, which hasn't after all been assigned as the
+    #solution anywhere in the block, gets eliminated from the rest of its row
+    #OUTSIDE the block, like in my ghost story above. The next 3 main processes
+    #(I said there were 6, remember?) do exactly the same thing except
+    #vertically, with the columns. (In a bigger grid, it's BoxSize mini-rows
+    #and BoxSize mini-columns per block instead of 3 of each.)
     def HandleGhostNumbers(self):
-        for rBlockCorner in [0,3,6]:
-            for cBlockCorner in [0,3,6]:
-                r = 0
-                rOtherBlocks = [0,3,6]
-                rOtherBlocks.remove(rBlockCorner)
-                CellsInRowOutsideBlock = []
+        Board = self.Board
+        B = self.Shape.BoxSize
+        Size = self.Shape.Size
+        for rBlockCorner in range(0, Size, B):
+            for cBlockCorner in range(0, Size, B):
+                NumsInBlock = self.BlockUsed[rBlockCorner + cBlockCorner // B]
+                #The OR of each mini-row and mini-column of the block
+                MiniRowOpts = [0] * B
+                MiniColOpts = [0] * B
+                for rLocal in range(B):
+                    for cLocal in range(B):
+                        Mask = Board[(rBlockCorner+rLocal)*Size + cBlockCorner+cLocal]
+                        MiniRowOpts[rLocal] |= Mask
+                        MiniColOpts[cLocal] |= Mask
                 
-                c = 0
-                cOtherBlocks = [0,3,6]
-                cOtherBlocks.remove(cBlockCorner)
-                CellsInColOutsideBlock = []
-                for rLocal in range(3):
+                for rLocal in range(B):
                     r = rLocal + rBlockCorner
-                    CellsInRowOutsideBlock = []
-                    RowInBlockOpts = ""
-                    OtherRowsInBlockOpts = ""
-                    NumsInBlock = ""
-                    for cLocal in range(3):
-                        c = cLocal + cBlockCorner
-                        RowInBlockOpts += self.Cells[r,c].Options
-                        OtherRowsInBlockOpts += self.Cells[rBlockCorner+((rLocal+1)%3),c].Options
-                        OtherRowsInBlockOpts += self.Cells[rBlockCorner+((rLocal+2)%3),c].Options
-                        NumsInBlock += self.Cells[rBlockCorner+(rLocal%3),c].Number
-                        NumsInBlock += self.Cells[rBlockCorner+((rLocal+1))%3,c].Number
-                        NumsInBlock += self.Cells[rBlockCorner+((rLocal+2))%3,c].Number
-                        CellsInRowOutsideBlock.append(self.Cells[r,cOtherBlocks[0]+cLocal])
-                        CellsInRowOutsideBlock.append(self.Cells[r,cOtherBlocks[1]+cLocal])
-                    for o in RowInBlockOpts:
-                        if (not o in OtherRowsInBlockOpts and not o in NumsInBlock):
-                            for TheCell in CellsInRowOutsideBlock:
-                                TheCell.Options = TheCell.Options.replace(o,"")
-                                self.Cells[TheCell.Row,TheCell.Col] = TheCell
+                    OtherRowsInBlockOpts = 0
+                    for Other in range(B):
+                        if Other != rLocal:
+                            OtherRowsInBlockOpts |= MiniRowOpts[Other]
+                    Ghosts = MiniRowOpts[rLocal] & ~OtherRowsInBlockOpts & ~NumsInBlock
+                    if Ghosts:
+                        for c in range(Size):
+                            if not cBlockCorner <= c < cBlockCorner + B:
+                                Board[r*Size + c] &= ~Ghosts
                                 
-                for cLocal in range(3):
+                for cLocal in range(B):
                     c = cLocal + cBlockCorner
-                    CellsInColOutsideBlock = []
-                    ColInBlockOpts = ""
-                    OtherColsInBlockOpts = ""
-                    NumsInBlock = ""
-                    for rLocal in range(3):
-                        r = rLocal + rBlockCorner
-                        ColInBlockOpts += self.Cells[r,c].Options
-                        OtherColsInBlockOpts += self.Cells[r,cBlockCorner+((cLocal+1)%3)].Options
-                        OtherColsInBlockOpts += self.Cells[r,cBlockCorner+((cLocal+2)%3)].Options
-                        NumsInBlock += self.Cells[r,cBlockCorner+(cLocal%3)].Number
-                        NumsInBlock += self.Cells[r,cBlockCorner+((cLocal+1)%3)].Number
-                        NumsInBlock += self.Cells[r,cBlockCorner+((cLocal+2)%3)].Number
-                        CellsInColOutsideBlock.append(self.Cells[rOtherBlocks[0]+rLocal,c])
-                        CellsInColOutsideBlock.append(self.Cells[rOtherBlocks[1]+rLocal,c])
-                    for o in ColInBlockOpts:
-                        if (not o in OtherColsInBlockOpts and not o in NumsInBlock):
-                            for TheCell in CellsInColOutsideBlock:
-                                TheCell.Options = TheCell.Options.replace(o,"")
-                                self.Cells[TheCell.Row,TheCell.Col] = TheCell
-    
-    #This is the function that takes the Options string for each Cell and
-    #deduces what number (if any) can fill that Cell. The first part is
-    #simple: if a Cell is left with only one Option, then that Option becomes
-    #the Cell's Number. But the second part goes further. There could be a case
-    #in which a cell has more than one Option listed (i.e., 3, 5, and 6), but
-    #one of these (say, 3) doesn't appear anywhere else in that Cell's column,
-    #or row, or block (considered separately). Then, we would fill the cell with 3.
+                    OtherColsInBlockOpts = 0
+                    for Other in range(B):
+                        if Other != cLocal:
+                            OtherColsInBlockOpts |= MiniColOpts[Other]
+                    Ghosts = MiniColOpts[cLocal] & ~OtherColsInBlockOpts & ~NumsInBlock
+                    if Ghosts:
+                        for r in range(Size):
+                            if not rBlockCorner <= r < rBlockCorner + B:
+                                Board[r*Size + c] &= ~Ghosts
+    
+    #This is the function that takes the Options for each Cell and deduces
+    #what number (if any) can fill that Cell. The first part is simple: if a
+    #Cell is left with only one Option, then that Option becomes the Cell's
+    #Number. But the second part goes further. There could be a case in which
+    #a cell has more than one Option listed (i.e., 3, 5, and 6), but one of
+    #these (say, 3) doesn't appear anywhere else in that Cell's column, or row,
+    #or block (considered separately). Then, we would fill the cell with 3.
     def FillCellNumber(self, TheCell):
         self.TheCell = TheCell
+        Mask = TheCell.Mask
         #If there is only one option left in the cell, that MUST be the answer.
-        if len(TheCell.Options) == 1:
-            TheCell.Number = TheCell.Options
-        else:
+        #(Mask & (Mask - 1) clears the lowest bit, so it's 0 for a single one.)
+        if Mask and not Mask & (Mask - 1):
+            TheCell.Number = self.Shape.Digits[Mask.bit_length() - 1]
+        elif Mask:
             #EVEN IF THE CELL HAS MULTIPLE OPTIONS, one of these options might
-            #be unique in the row, or column, or block. That option is the answer.
-            OtherCellsInCol = []
-            OtherCellsInRow = []
-            OtherCellsInBlock = []
-            #These commands assemble a list of the other cells in the current
-            #cell's column, row, and block, respectively, without including the
-            #current cell.
-            for r in range(9):
-                OtherCellsInCol.append(self.Cells[r,TheCell.Col])
-            OtherCellsInCol.remove(TheCell)
-            for c in range(9):
-                OtherCellsInRow.append(self.Cells[TheCell.Row,c])
-            OtherCellsInRow.remove(TheCell)
-            BC = TheCell.BlockCoords()
-            for b in range(9):
-                OtherCellsInBlock.append(self.Cells[BC[b][0],BC[b][1]])
-            OtherCellsInBlock.remove(TheCell)
-            #Now we check whether the Cell has an option which also features
-            #in the options of the other groups (i.e., the column, row, or block),
-            #one group at a time. First we have to concatenate all the options
-            #for each group, separately, so we're comparing strings to strings.
-            StringOtherOptionsInCol = ""
-            StringOtherOptionsInRow = ""
-            StringOtherOptionsInBlock = ""
-            for r in range(8):
-                StringOtherOptionsInCol += OtherCellsInCol[r].Options
-            for c in range(8):
-                StringOtherOptionsInRow += OtherCellsInRow[c].Options
-            for b in range(8):
-                StringOtherOptionsInBlock += OtherCellsInBlock[b].Options
-            
+            #be unique in the row, or column, or block. That option is the
+            #answer. The options in the rest of each group come from the
+            #tallies made by TallyOptions.
+            r = TheCell.Row
+            c = TheCell.Col
+            b = TheCell.Block
+            OtherOptionsInCol = self.ColTwice[c] | (self.ColOnce[c] & ~Mask)
+            OtherOptionsInRow = self.RowTwice[r] | (self.RowOnce[r] & ~Mask)
+            OtherOptionsInBlock = self.BlockTwice[b] | (self.BlockOnce[b] & ~Mask)
             #If an option is unique to the cell (as compared separately with the
             #rest of its column, row, and block), then it must be the answer.
-            for i in range(len(TheCell.Options)):
-                if not TheCell.Options[i] in StringOtherOptionsInCol:
-                    TheCell.Number = TheCell.Options[i]
-                if not TheCell.Options[i] in StringOtherOptionsInRow:
-                    TheCell.Number = TheCell.Options[i]
-                if not TheCell.Options[i] in StringOtherOptionsInBlock:
-                    TheCell.Number = TheCell.Options[i]
+            Unique = Mask & ~(OtherOptionsInCol & OtherOptionsInRow & OtherOptionsInBlock)
+            if Unique:
+                TheCell.Number = self.Shape.Digits[Unique.bit_length() - 1]
         return TheCell.Number
     
     #Checks to see if all the Cells are full; if so, returns True.
     def IsGridFull(self):
-        FullCells = 0
-        for r in range(9):
-            for c in range(9):
-                if self.Cells[r,c].IsCellFull():
-                    FullCells += 1
-        return FullCells == 81
+        return 0 not in self.Board[self.Shape.NumberStart:self.Shape.UsedStart]
+    
+    #The two-step cycle above looks at all 81 Cells, every time, even when
+    #only one of them changed since last time. The methods below do the same
+    #job the other way around: every time a Number is placed (Place), they
+    #take it out of the Options of its Peers and nothing else, and only
+    #follow up on the Cells and units that actually changed. Those go on two
+    #to-do lists, which Propagate works through:
+    #  - Singles are Cells that are down to one Option
+    #  - Hiddens are (unit, number) pairs where that number has one or no
+    #    places left to go in that unit
+    #OptionCount (on the Board, from Shape.CountStart on) keeps track of how
+    #many empty Cells in each unit u still have the number d+1 as an Option,
+    #at u*Size+d, so spotting a Hidden never needs a scan (Size being 9 in a
+    #9x9 grid). The Hiddens list holds these places on the Board.
+    #UnitUsed is like RowUsed, ColUsed and BlockUsed rolled into one.
+    #These methods work on the Board directly rather than through the Cells,
+    #which would be a lot slower.
+    
+    #Sets up the counts and to-do lists from scratch, based on the Numbers and
+    #Options the Cells have right now. Returns False if the grid is broken
+    #(a Number repeated in a unit, or an empty Cell without Options).
+    def StartPropagation(self):
+        Board = self.Board
+        TheShape = self.Shape
+        N = TheShape.CellCount
+        Size = TheShape.Size
+        CellUnits = TheShape.CellUnits
+        UnitUsed = [0] * 3 * Size
+        OptionCount = [0] * 3 * Size * Size
+        Singles = []
+        Hiddens = []
+        EmptyCount = 0
+        self.Started = False
+        for i in range(N):
+            n = Board[N + i]
+            if n:
+                Bit = 1 << (n - 1)
+                for u in CellUnits[i]:
+                    if UnitUsed[u] & Bit:
+                        return False
+                    UnitUsed[u] |= Bit
+        for i in range(N):
+            if Board[N + i]:
+                Board[i] = 0
+                continue
+            r, c, b = CellUnits[i]
+            Mask = Board[i] & ~(UnitUsed[r] | UnitUsed[c] | UnitUsed[b])
+            Board[i] = Mask
+            if Mask == 0:
+                return False
+            if not Mask & (Mask - 1):
+                Singles.append(i)
+            EmptyCount += 1
+            while Mask:
+                Bit = Mask & -Mask
+                Mask ^= Bit
+                d = Bit.bit_length() - 1
+                OptionCount[r * Size + d] += 1
+                OptionCount[c * Size + d] += 1
+                OptionCount[b * Size + d] += 1
+        for k in range(3 * Size * Size):
+            if OptionCount[k] < 2 and not UnitUsed[k // Size] >> (k % Size) & 1:
+                Hiddens.append(TheShape.CountStart + k)
+        Board[TheShape.UsedStart:TheShape.CountStart] = UnitUsed
+        Board[TheShape.CountStart:TheShape.EmptyAt] = OptionCount
+        Board[TheShape.EmptyAt] = EmptyCount
+        self.Singles = Singles
+        self.Hiddens = Hiddens
+        self.Started = True
+        return True
+    
+    #Fills Cell number Index with the number whose bit is Bit, takes that
+    #number out of the Options of its Peers, and puts anything that changed
+    #on the to-do lists. Returns False if that breaks the grid.
+    def Place(self, Index, Bit):
+        Board = self.Board
+        Others = Board[Index]
+        if not Others & Bit:
+            return False
+        TheShape = self.Shape
+        CountBases = TheShape.CountBases
+        Singles = self.Singles
+        Hiddens = self.Hiddens
+        Bases = CountBases[Index]
+        d = Bit.bit_length() - 1
+        Board[TheShape.NumberStart + Index] = d + 1
+        #The Cell's own Options are no longer Options anywhere
+        Board[Index] = 0
+        Board[TheShape.EmptyAt] -= 1
+        while Others:
+            b = Others & -Others
+            Others ^= b
+            e = b.bit_length() - 1
+            for Base in Bases:
+                k = Base + e
+                Board[k] -= 1
+                if Board[k] < 2:
+                    Hiddens.append(k)
+        UsedStart = TheShape.UsedStart
+        for u in TheShape.CellUnits[Index]:
+            Board[UsedStart + u] |= Bit
+        for p in TheShape.Peers[Index]:
+            Mask = Board[p]
+            if Mask & Bit:
+                Mask ^= Bit
+                Board[p] = Mask
+                if Mask == 0:
+                    return False
+                if not Mask & (Mask - 1):
+                    Singles.append(p)
+                for Base in CountBases[p]:
+                    k = Base + d
+                    Board[k] -= 1
+                    if Board[k] < 2:
+                        Hiddens.append(k)
+        return True
+    
+    #Takes the Options in Mask away from Cell number Index and puts anything
+    #that changed on the to-do lists, the same way Place does for its Peers.
+    #This is what the solving techniques (see AllTechniques) use. A Cell that
+    #runs out of Options goes on the Singles list too, so Propagate finds out
+    #the grid is broken. Returns True if any Options were taken away.
+    def Eliminate(self, Index, Mask):
+        Board = self.Board
+        Mask &= Board[Index]
+        if not Mask:
+            return False
+        Left = Board[Index] ^ Mask
+        Board[Index] = Left
+        if not Left & (Left - 1):
+            self.Singles.append(Index)
+        Hiddens = self.Hiddens
+        Bases = self.Shape.CountBases[Index]
+        while Mask:
+            b = Mask & -Mask
+            Mask ^= b
+            d = b.bit_length() - 1
+            for Base in Bases:
+                k = Base + d
+                Board[k] -= 1
+                if Board[k] < 2:
+                    Hiddens.append(k)
+        return True
+    
+    #Works through the to-do lists until they're empty, placing every Single
+    #and every Hidden, which may well add more to the lists. Returns False as
+    #soon as the grid turns out to be broken.
+    def Propagate(self):
+        Board = self.Board
+        TheShape = self.Shape
+        Size = TheShape.Size
+        Units = TheShape.Units
+        NumberStart = TheShape.NumberStart
+        UsedStart = TheShape.UsedStart
+        CountStart = TheShape.CountStart
+        Singles = self.Singles
+        Hiddens = self.Hiddens
+        self.Passes += 1
+        while Singles or Hiddens:
+            if Singles:
+                i = Singles.pop()
+                if not Board[NumberStart + i] and not self.Place(i, Board[i]):
+                    return False
+            else:
+                k = Hiddens.pop()
+                u, d = divmod(k - CountStart, Size)
+                Bit = 1 << d
+                if Board[UsedStart + u] & Bit:
+                    continue
+                if Board[k] == 0:
+                    return False
+                if Board[k] == 1:
+                    for i in Units[u]:
+                        if Board[i] & Bit:
+                            break
+                    if not self.Place(i, Bit):
+                        return False
+        return True
+    
+    #Propagate one Number at a time, for IterSolve: works through the to-do
+    #lists until it has placed one Single or Hidden, and returns what it
+    #placed, as (Index, Number, Technique, True) like IterSolve yields.
+    #Returns None if the lists ran out first, or False if the grid turned out
+    #to be broken.
+    def PlaceNextSingle(self):
+        Board = self.Board
+        TheShape = self.Shape
+        while self.Singles or self.Hiddens:
+            if self.Singles:
+                i = self.Singles.pop()
+                if Board[TheShape.NumberStart + i]:
+                    continue
+                Bit = Board[i]
+                Technique = "Naked single"
+            else:
+                k = self.Hiddens.pop()
+                u, d = divmod(k - TheShape.CountStart, TheShape.Size)
+                Bit = 1 << d
+                if Board[TheShape.UsedStart + u] & Bit:
+                    continue
+                if Board[k] == 0:
+                    return False
+                if Board[k] > 1:
+                    continue
+                for i in TheShape.Units[u]:
+                    if Board[i] & Bit:
+                        break
+                Technique = "Hidden single"
+            if not self.Place(i, Bit):
+                return False
+            return (i, TheShape.Digits[Bit.bit_length() - 1], Technique, True)
+        return None
+    
+    #Puts Number (1 to Size, or 0 to empty the Cell) in Cell number Index,
+    #the way a player would. If the solving has started (see IterSolve), a
+    #new Number goes in with Place, so everything worked out so far still
+    #stands and nothing gets worked out again. Emptying a Cell, or changing
+    #its Number, can make some of that wrong, so then the Options all go back
+    #to the start, and the next IterSolve starts over. (So does a Number that
+    #breaks the grid, which IterSolve will then complain about.) Returns False
+    #if the Number breaks the grid.
+    def Enter(self, Index, Number):
+        Board = self.Board
+        TheShape = self.Shape
+        N = TheShape.CellCount
+        if self.Started and Number and not Board[N + Index]:
+            Before = self.Snapshot()
+            if self.Place(Index, 1 << (Number - 1)):
+                return True
+            self.Restore(Before)
+        Board[N + Index] = Number
+        for i in range(N):
+            Board[i] = 0 if Board[N + i] else TheShape.FullMask
+        self.Singles = []
+        self.Hiddens = []
+        return self.StartPropagation()
+    
+    #Fills in the whole grid from a list of Numbers (1 to Size), like the
+    #solutions that come out of DancingLinks.SolveSudoku.
+    def Fill(self, Numbers):
+        N = self.Shape.CellCount
+        self.Board[N:2 * N] = Numbers
+        self.Board[:N] = [0] * N
+        self.Board[self.Shape.EmptyAt] = 0
+        self.Started = False
+    
+    #Takes a copy of everything that changes while solving, so that a guess
+    #can be undone with Restore. That's the Board, which is one list copy,
+    #and whether propagation had started, since the counts on the Board only
+    #mean anything once it has (and a Snapshot taken before DeduceAll gets
+    #restored after it has started them).
+    def Snapshot(self):
+        return self.Board[:], self.Started
+    
+    #Puts the grid back the way it was when Snapshot was taken. (The Board is
+    #copied back into place, rather than replaced, so the Cells still look at
+    #the right one.)
+    def Restore(self, Snapshot):
+        self.Board[:], self.Started = Snapshot
+        self.Singles = []
+        self.Hiddens = []
+    
+    #Squeezes everything it can out of the grid by logic. Propagate goes
+    #first, since it's the cheapest. When it runs dry, the Techniques get a
+    #go, cheapest first, and as soon as one of them manages to take away some
+    #Options it's straight back to Propagate. Once none of them can do
+    #anything more, that's as far as logic goes. Techniques is a list of
+    #(name, function) pairs like AllTechniques, which is what's used if it's
+    #left out. Returns False if the grid turned out to be broken along the
+    #way.
+    def DeduceAll(self, Techniques = None):
+        if Techniques is None:
+            Techniques = AllTechniques
+        if not self.StartPropagation():
+            return False
+        while True:
+            if self.Stats is not None:
+                self.Stats.Sweeps += 1
+            if not self.RunStep("Singles", self.Propagate):
+                return False
+            if self.EmptyCount == 0:
+                return True
+            for Name, Technique in Techniques:
+                if self.RunStep(Name, Technique, self):
+                    break
+            else:
+                return True
             
+#The solving techniques that DeduceAll uses when naked and hidden singles
+#aren't enough. Each one is a function that takes a Grid (with propagation
+#already started), takes away whatever Options it can with Grid.Eliminate,
+#and returns True if it took any away.
+
+#The "more general way to state the rule" that I mentioned back in
+#HandleGhostNumbers. Wherever a block crosses a row or column, if a number's
+#Options in the block are all in the crossing, that number has to go in the
+#crossing, so it can't go anywhere else in the row or column ("pointing",
+#which is what the ghost numbers were). And the other way around: if a
+#number's Options in the row or column are all in the crossing, it can't go
+#anywhere else in the block ("claiming").
+def PointingAndClaiming(TheGrid):
+    Board = TheGrid.Board
+    Changed = False
+    for Both, BlockRest, LineRest in TheGrid.Shape.Intersections:
+        BothOpts = 0
+        for i in Both:
+            BothOpts |= Board[i]
+        if not BothOpts:
+            continue
+        BlockRestOpts = 0
+        for i in BlockRest:
+            BlockRestOpts |= Board[i]
+        LineRestOpts = 0
+        for i in LineRest:
+            LineRestOpts |= Board[i]
+        Pointing = BothOpts & ~BlockRestOpts & LineRestOpts
+        if Pointing:
+            for i in LineRest:
+                Changed = TheGrid.Eliminate(i, Pointing) or Changed
+        Claiming = BothOpts & ~LineRestOpts & BlockRestOpts
+        if Claiming:
+            for i in BlockRest:
+                Changed = TheGrid.Eliminate(i, Claiming) or Changed
+    return Changed
+
+#Naked pairs, triples and quads: if Count Cells in a unit have only Count
+#Options between them, those Options have to go in those Cells, so they can
+#be taken away from every other Cell in the unit.
+def NakedSubsets(TheGrid, Count):
+    Board = TheGrid.Board
+    Changed = False
+    for Unit in TheGrid.Shape.Units:
+        Empty = [i for i in Unit if Board[i]]
+        if len(Empty) <= Count:
+            continue
+        Small = [i for i in Empty if CountOptions(Board[i]) <= Count]
+        for Subset in combinations(Small, Count):
+            Opts = 0
+            for i in Subset:
+                Opts |= Board[i]
+            if CountOptions(Opts) == Count:
+                for i in Empty:
+                    if i not in Subset:
+                        Changed = TheGrid.Eliminate(i, Opts) or Changed
+    return Changed
+
+#Hidden pairs, triples and quads: if Count numbers can only go in the same
+#Count Cells of a unit, those Cells have to hold those numbers, so all their
+#other Options can be taken away.
+def HiddenSubsets(TheGrid, Count):
+    Board = TheGrid.Board
+    Changed = False
+    for Unit in TheGrid.Shape.Units:
+        #Where in the unit each number can go, as a Mask of positions
+        Places = {}
+        for p in range(len(Unit)):
+            Mask = Board[Unit[p]]
+            while Mask:
+                Bit = Mask & -Mask
+                Mask ^= Bit
+                Places[Bit] = Places.get(Bit, 0) | 1 << p
+        if len(Places) <= Count:
+            continue
+        Few = [Bit for Bit in Places if CountOptions(Places[Bit]) <= Count]
+        for Subset in combinations(Few, Count):
+            Opts = 0
+            Where = 0
+            for Bit in Subset:
+                Opts |= Bit
+                Where |= Places[Bit]
+            if CountOptions(Where) == Count:
+                for p in range(len(Unit)):
+                    if Where >> p & 1:
+                        Changed = TheGrid.Eliminate(Unit[p], ~Opts) or Changed
+    return Changed
+
+#X-Wing (Count 2) and Swordfish (Count 3). Take one number. If in Count rows,
+#it can only go in the same Count columns, then in those columns it has to
+#go in those rows, so it can't go anywhere else in those columns. The same
+#goes with rows and columns swapped.
+def Fish(TheGrid, Count):
+    Board = TheGrid.Board
+    Size = TheGrid.Shape.Size
+    Changed = False
+    for d in range(Size):
+        Bit = 1 << d
+        #First with rows as the lines, then with columns
+        for Step, Across in ((Size, 1), (1, Size)):
+            Lines = []
+            for Line in range(Size):
+                Where = 0
+                for p in range(Size):
+                    if Board[Line * Step + p * Across] & Bit:
+                        Where |= 1 << p
+                if 2 <= CountOptions(Where) <= Count:
+                    Lines.append((Line, Where))
+            for Subset in combinations(Lines, Count):
+                Where = 0
+                for Line, LineWhere in Subset:
+                    Where |= LineWhere
+                if CountOptions(Where) == Count:
+                    Chosen = [Line for Line, LineWhere in Subset]
+                    for p in range(Size):
+                        if Where >> p & 1:
+                            for Line in range(Size):
+                                if Line not in Chosen:
+                                    Changed = TheGrid.Eliminate(Line * Step + p * Across, Bit) or Changed
+    return Changed
+
+#Every technique DeduceAll knows, cheapest first.
+AllTechniques = [("Pointing and claiming", PointingAndClaiming),
+                 ("Naked pairs", partial(NakedSubsets, Count = 2)),
+                 ("Hidden pairs", partial(HiddenSubsets, Count = 2)),
+                 ("Naked triples", partial(NakedSubsets, Count = 3)),
+                 ("Hidden triples", partial(HiddenSubsets, Count = 3)),
+                 ("X-Wing", partial(Fish, Count = 2)),
+                 ("Naked quads", partial(NakedSubsets, Count = 4)),
+                 ("Hidden quads", partial(HiddenSubsets, Count = 4)),
+                 ("Swordfish", partial(Fish, Count = 3))]
+
 #This is where you make a pretty user interface where you can input puzzles
 #with just a few clicks. Obviously, I haven't done this...for now, make a 
-#NumPy array like the examples listed and comment it out if you're not currently
+#list of rows like the examples listed and comment it out if you're not currently
 #using it. DOUBLE-CHECK to make sure you entered the numbers right!!! If you
 #entered the numbers row by row, check them column by column, and vice versa.
+#(The same puzzles are in the Puzzles folder as one-liners, which is what
+#SudokuBenchmark.py times the solvers on.)
 def FirstGridInput():
     #A puzzle marked "evil"
-    """SampleSet = np.array([("7"," "," "," "," ","6","8"," ","2"),
-                          (" ","2"," "," "," "," "," "," ","4"),
-                          (" "," ","6"," ","9"," "," "," "," "),
-                          (" "," "," ","9"," ","7","5"," "," "),
-                          (" ","6"," "," "," "," "," ","8"," "),
-                          (" "," ","4","3"," ","5"," "," "," "),
-                          (" "," "," "," ","5"," ","4"," "," "),
-                          ("8"," "," "," "," "," "," ","3"," "),
-                          ("9"," ","2","7"," "," "," "," ","5")])"""
+    """SampleSet = [("7"," "," "," "," ","6","8"," ","2"),
+                 (" ","2"," "," "," "," "," "," ","4"),
+                 (" "," ","6"," ","9"," "," "," "," "),
+                 (" "," "," ","9"," ","7","5"," "," "),
+                 (" ","6"," "," "," "," "," ","8"," "),
+                 (" "," ","4","3"," ","5"," "," "," "),
+                 (" "," "," "," ","5"," ","4"," "," "),
+                 ("8"," "," "," "," "," "," ","3"," "),
+                 ("9"," ","2","7"," "," "," "," ","5")]"""
     
     #Another puzzle marked "evil"
-    """SampleSet = np.array([("8","5","6","2"," "," "," "," "," "),
-                          (" ","1"," "," "," ","3"," "," "," "),
-                          (" ","7","2"," "," ","1"," "," "," "),
-                          (" ","8"," "," ","9"," ","7"," "," "),
-                          (" "," ","7"," "," "," ","4"," "," "),
-                          (" "," ","5"," ","3"," "," ","9"," "),
-                          (" "," "," ","6"," "," ","5","7"," "),
-                          (" "," "," ","1"," "," "," ","8"," "),
-                          (" "," "," "," "," ","9","1","6","2")])"""
+    """SampleSet = [("8","5","6","2"," "," "," "," "," "),
+                 (" ","1"," "," "," ","3"," "," "," "),
+                 (" ","7","2"," "," ","1"," "," "," "),
+                 (" ","8"," "," ","9"," ","7"," "," "),
+                 (" "," ","7"," "," "," ","4"," "," "),
+                 (" "," ","5"," ","3"," "," ","9"," "),
+                 (" "," "," ","6"," "," ","5","7"," "),
+                 (" "," "," ","1"," "," "," ","8"," "),
+                 (" "," "," "," "," ","9","1","6","2")]"""
                           
     #Evil again...
-    """SampleSet = np.array([(" "," ","3"," "," ","5"," "," "," "),
-                          ("1"," "," ","4"," ","7"," "," "," "),
-                          (" "," "," "," ","1"," ","2","6"," "),
-                          (" "," "," "," "," "," "," ","4","9"),
-                          ("6","5"," "," ","7"," "," ","1","3"),
-                          ("7","8"," "," "," "," "," "," "," "),
-                          (" ","4","7"," ","3"," "," "," "," "),
-                          (" "," "," ","6"," ","2"," "," ","4"),
-                          (" "," "," ","7"," "," ","3"," "," ")])"""
+    """SampleSet = [(" "," ","3"," "," ","5"," "," "," "),
+                 ("1"," "," ","4"," ","7"," "," "," "),
+                 (" "," "," "," ","1"," ","2","6"," "),
+                 (" "," "," "," "," "," "," ","4","9"),
+                 ("6","5"," "," ","7"," "," ","1","3"),
+                 ("7","8"," "," "," "," "," "," "," "),
+                 (" ","4","7"," ","3"," "," "," "," "),
+                 (" "," "," ","6"," ","2"," "," ","4"),
+                 (" "," "," ","7"," "," ","3"," "," ")]"""
                           
     #And again...
-    """SampleSet = np.array([("1"," ","4"," "," "," "," "," "," "),
-                          (" ","2","7"," "," ","4"," ","9","8"),
-                          (" "," "," ","7"," "," "," "," ","5"),
-                          (" "," "," ","9"," "," ","2"," "," "),
-                          (" "," ","6","3"," ","2","8"," "," "),
-                          (" "," ","3"," "," ","7"," "," "," "),
-                          ("7"," "," "," "," ","3"," "," "," "),
-                          ("9","8"," ","4"," "," ","5","3"," "),
-                          (" "," "," "," "," "," ","4"," ","1")])"""
+    """SampleSet = [("1"," ","4"," "," "," "," "," "," "),
+                 (" ","2","7"," "," ","4"," ","9","8"),
+                 (" "," "," ","7"," "," "," "," ","5"),
+                 (" "," "," ","9"," "," ","2"," "," "),
+                 (" "," ","6","3"," ","2","8"," "," "),
+                 (" "," ","3"," "," ","7"," "," "," "),
+                 ("7"," "," "," "," ","3"," "," "," "),
+                 ("9","8"," ","4"," "," ","5","3"," "),
+                 (" "," "," "," "," "," ","4"," ","1")]"""
                           
     #One marked "expert" from a different website
-    """SampleSet = np.array([(" "," "," "," ","3"," "," "," "," "),
-                          (" "," ","1"," "," "," ","9"," ","8"),
-                          (" "," "," "," "," "," "," "," "," "),
-                          (" "," "," "," "," ","4"," ","7"," "),
-                          ("6"," "," ","1","5","2"," "," ","3"),
-                          (" ","1"," ","7"," "," "," "," "," "),
-                          (" "," "," "," "," "," "," "," "," "),
-                          ("2"," ","5"," "," "," ","4"," "," "),
-                          (" "," "," "," ","9"," "," "," "," ")])"""
+    """SampleSet = [(" "," "," "," ","3"," "," "," "," "),
+                 (" "," ","1"," "," "," ","9"," ","8"),
+                 (" "," "," "," "," "," "," "," "," "),
+                 (" "," "," "," "," ","4"," ","7"," "),
+                 ("6"," "," ","1","5","2"," "," ","3"),
+                 (" ","1"," ","7"," "," "," "," "," "),
+                 (" "," "," "," "," "," "," "," "," "),
+                 ("2"," ","5"," "," "," ","4"," "," "),
+                 (" "," "," "," ","9"," "," "," "," ")]"""
                           
     #A "hard" puzzle
-    SampleSet = np.array([(" ","6"," ","9","3"," ","5"," "," "),
-                          (" ","8"," "," "," "," ","2"," "," "),
-                          (" "," ","9","8"," "," ","1"," ","6"),
-                          ("8","7"," "," "," "," "," "," "," "),
-                          (" "," ","2"," ","1"," ","7"," "," "),
-                          (" "," "," "," "," "," "," ","6","2"),
-                          ("3"," ","8"," "," ","6","9"," "," "),
-                          (" "," ","1"," "," "," "," ","2"," "),
-                          (" "," ","4"," ","2","5"," ","7"," ")])
+    SampleSet = [(" ","6"," ","9","3"," ","5"," "," "),
+                 (" ","8"," "," "," "," ","2"," "," "),
+                 (" "," ","9","8"," "," ","1"," ","6"),
+                 ("8","7"," "," "," "," "," "," "," "),
+                 (" "," ","2"," ","1"," ","7"," "," "),
+                 (" "," "," "," "," "," "," ","6","2"),
+                 ("3"," ","8"," "," ","6","9"," "," "),
+                 (" "," ","1"," "," "," "," ","2"," "),
+                 (" "," ","4"," ","2","5"," ","7"," ")]
     
     #A "medium" puzzle
-    """SampleSet = np.array([(" ","7"," "," ","1"," ","3","5","6"),
-                          (" "," ","6"," "," ","7"," ","8"," "),
-                          (" ","8"," "," ","3"," "," ","9"," "),
-                          (" "," ","1"," "," "," "," "," ","7"),
-                          ("9"," "," "," ","6"," "," "," ","8"),
-                          ("8"," "," "," "," "," ","5"," "," "),
-                          (" ","6"," "," ","4"," "," ","1"," "),
-                          (" ","4"," ","1"," "," ","8"," "," "),
-                          ("7","1","8"," ","9"," "," ","2"," ")])"""
+    """SampleSet = [(" ","7"," "," ","1"," ","3","5","6"),
+                 (" "," ","6"," "," ","7"," ","8"," "),
+                 (" ","8"," "," ","3"," "," ","9"," "),
+                 (" "," ","1"," "," "," "," "," ","7"),
+                 ("9"," "," "," ","6"," "," "," ","8"),
+                 ("8"," "," "," "," "," ","5"," "," "),
+                 (" ","6"," "," ","4"," "," ","1"," "),
+                 (" ","4"," ","1"," "," ","8"," "," "),
+                 ("7","1","8"," ","9"," "," ","2"," ")]"""
     
     #An "easy" puzzle   
-    """SampleSet = np.array([("3","9","7"," ","4"," "," ","1"," "),
-                          ("8","2"," "," "," "," ","5","3"," "),
-                          (" ","4"," "," ","6","3","7"," ","9"),
-                          (" "," ","2","1"," "," "," "," "," "),
-                          (" "," ","9","3"," ","6","8"," "," "),
-                          (" "," "," "," "," ","7","1"," "," "),
-                          ("7"," ","5","6","3"," "," ","9"," "),
-                          (" ","6","8"," "," "," "," ","7","1"),
-                          (" ","3"," "," ","7"," ","2","5","6")])"""
+    """SampleSet = [("3","9","7"," ","4"," "," ","1"," "),
+                 ("8","2"," "," "," "," ","5","3"," "),
+                 (" ","4"," "," ","6","3","7"," ","9"),
+                 (" "," ","2","1"," "," "," "," "," "),
+                 (" "," ","9","3"," ","6","8"," "," "),
+                 (" "," "," "," "," ","7","1"," "," "),
+                 ("7"," ","5","6","3"," "," ","9"," "),
+                 (" ","6","8"," "," "," "," ","7","1"),
+                 (" ","3"," "," ","7"," ","2","5","6")]"""
     #Not much to see here; it takes the starting numbers and makes a Grid
     #out of them.
-    NewCells = np.empty((9,9), dtype=Cell)
-    for r in range(9):
-        for c in range(9):
-            NewCells[r,c] = Cell(r,c,SampleSet[r,c],"123456789","")
-    NewGrid = Grid(NewCells)
+    NewGrid = MakeGrid(SampleSet)
     NewGrid.GetAllOptions()
     return NewGrid
 
-#Basic recursion that 1) refreshes the options for all of the cells, then
-#2) fills each cell (if possible) based on the currently known options. If
-#the function hasn't reached its base case (Grid 100% solved), it keeps going,
-#and going, and going, and going, and going....
-def RecursiveSolve(GridNow):
-    if GridNow.IsGridFull() == True:
+#Makes a Grid out of a square array of Numbers (" " for an empty cell), with
+#every Option still open. The size of the array says what size of grid it
+#is: 9x9, 16x16 or 25x25 (or 4x4, if you're in a hurry). Any square array
+#will do, a list of tuples as much as a NumPy array, and the Cells only get
+#made if someone asks for them.
+def MakeGrid(SampleSet):
+    Size = len(SampleSet)
+    BoxSize = int(round(Size ** 0.5))
+    if BoxSize * BoxSize != Size:
+        raise ValueError("A grid can't be " + str(Size) + " cells wide")
+    TheShape = ShapeOf(BoxSize)
+    Numbers = [TheShape.DigitBit[SampleSet[r][c]].bit_length()
+               for r in range(Size) for c in range(Size)]
+    return GridFromNumbers(Numbers)
+
+#Reads a puzzle written on one line, the way puzzle collections usually
+#store them: 81 characters, row by row, with "." or "0" for an empty cell.
+#(256 characters for a 16x16 grid and 625 for a 25x25 one, using the letters
+#from Symbols above 9.) Returns a list of numbers, with 0 for an empty cell.
+def ReadNumbers(Line):
+    Line = Line.strip()
+    BoxSize = int(round(len(Line) ** 0.25))
+    if BoxSize ** 4 != len(Line) or not 2 <= BoxSize <= 5:
+        raise ValueError("Not a puzzle: " + Line)
+    TheDigits = ShapeOf(BoxSize).Digits
+    if not set(Line) <= set(TheDigits + ".0"):
+        raise ValueError("Not a puzzle: " + Line)
+    return [0 if ch in ".0" else TheDigits.index(ch) + 1 for ch in Line]
+
+#Makes a Grid out of a list of numbers like the one ReadNumbers gives, with
+#every Option still open (straight onto the Board, without any Cells).
+def GridFromNumbers(Numbers):
+    Size = int(round(len(Numbers) ** 0.5))
+    BoxSize = int(round(Size ** 0.5))
+    if BoxSize * BoxSize != Size or Size * Size != len(Numbers):
+        raise ValueError("A grid can't have " + str(len(Numbers)) + " cells")
+    return Grid(Board = [ShapeOf(BoxSize).FullMask] * len(Numbers) + [int(n) for n in Numbers])
+
+#Makes a Grid out of a puzzle written on one line (see ReadNumbers).
+def ReadGrid(Line):
+    return GridFromNumbers(ReadNumbers(Line))
+
+#The solve entry point. It used to be a basic recursion that 1) refreshed the
+#options for all of the cells, then 2) filled each cell (if possible), and
+#kept going, and going, and going, until the Grid was 100% solved. Now the
+#solving is done by Place and Propagate, which only touch what changed, with
+#BacktrackSolve guessing where logic alone runs dry. (To watch it go
+#step-by-step, see IterSolve, and main.)
+#Engine picks how the puzzle gets solved: "Deduction" is everything above, and
+#"DancingLinks" hands the whole grid to DancingLinksSolve instead. Stats, if
+#given, is a SolveStats to keep track of the solving in.
+def RecursiveSolve(GridNow, Engine = "Deduction", Stats = None):
+    if Stats is not None:
+        GridNow.Stats = Stats
+    if Engine == "DancingLinks":
+        return GridNow.RunStep("Dancing Links", DancingLinksSolve, GridNow)
+    elif Engine != "Deduction":
+        raise ValueError("Unknown engine: " + str(Engine))
+    Solved = BacktrackSolve(GridNow)
+    if Solved is None:
+        raise ValueError("This puzzle has no solution")
+    return Solved
+
+#For when logic alone runs dry. First it squeezes everything it can out of
+#the grid with DeduceAll. If the grid still isn't full, it picks the empty
+#Cell with the fewest Options left and tries each of them in turn (see
+#GuessSolve). Returns the solved Grid, or None if the puzzle has no solution.
+def BacktrackSolve(GridNow):
+    if not GridNow.DeduceAll():
+        return None
+    return GuessSolve(GridNow)
+
+#Tries each Option of the empty Cell with the fewest Options, following up
+#each guess with Propagate and then guessing again if need be. A guess that
+#ends in a broken grid is undone with Restore and the next Option gets a go.
+#Picking the Cell with the fewest Options keeps the number of guesses small,
+#and since every guess fills a Cell, it can never go around in circles.
+def GuessSolve(GridNow):
+    if GridNow.EmptyCount == 0:
         return GridNow
-    else:
-        GridNow.GetAllOptions()
-        GridNow.FillAllNumbers()
-        NewGrid = GridNow
-        return RecursiveSolve(NewGrid)
+    Guess, Fewest = PickGuess(GridNow)
+    Before = GridNow.Snapshot()
+    Stats = GridNow.Stats
+    Mask = GridNow.Board[Guess]
+    while Mask:
+        Bit = Mask & -Mask
+        Mask ^= Bit
+        if Stats is not None:
+            Stats.Guesses += 1
+            Stats.Event("Guess", {"Cell": Guess, "Number": GridNow.Shape.Digits[Bit.bit_length() - 1],
+                                  "Options": Fewest})
+        if GridNow.Place(Guess, Bit) and GridNow.RunStep("Singles", GridNow.Propagate) \
+                and GuessSolve(GridNow) is not None:
+            return GridNow
+        GridNow.Restore(Before)
+        if Stats is not None:
+            Stats.Backtracks += 1
+            Stats.Event("Backtrack", {"Cell": Guess})
+    return None
+
+#Finds the empty Cell with the fewest Options (stopping early at one with
+#two, since none can have fewer without Propagate having filled it). Returns
+#its number and how many Options it has.
+def PickGuess(GridNow):
+    Guess = -1
+    Fewest = GridNow.Shape.Size + 1
+    Board = GridNow.Board
+    for i in range(GridNow.Shape.CellCount):
+        Size = CountOptions(Board[i])
+        if 0 < Size < Fewest:
+            Guess = i
+            Fewest = Size
+            if Size == 2:
+                break
+    return Guess, Fewest
+
+#Solves the grid one step at a time, as a generator, for hints and for
+#watching it go step-by-step. Every time it works something out, it does it
+#to the grid and yields (Index, Number, Technique, Placed): Placed is True if
+#Number went in Cell number Index, and False if Technique took Number out of
+#that Cell's Options. Technique is "Naked single", "Hidden single", the name
+#of one of the Techniques (AllTechniques if left out), or "Guess" when logic
+#alone has run dry. (A Guess is never wrong: it's the Number the Cell has in
+#the solution, found by solving a copy of the grid with GuessSolve.)
+#It carries on from wherever the grid is, so a hint is only the work of one
+#step, not of a whole solve. Numbers the player puts in in between should go
+#in with Grid.Enter, which keeps everything worked out so far. Raises
+#ValueError if the puzzle (or the player) has made it impossible.
+def IterSolve(GridNow, Techniques = None):
+    if Techniques is None:
+        Techniques = AllTechniques
+    TheShape = GridNow.Shape
+    N = TheShape.CellCount
+    Board = GridNow.Board
+    while True:
+        if not GridNow.Started and not GridNow.StartPropagation():
+            raise ValueError("This puzzle has no solution")
+        if GridNow.EmptyCount == 0:
+            return
+        Step = GridNow.PlaceNextSingle()
+        if Step is False:
+            raise ValueError("This puzzle has no solution")
+        if Step is not None:
+            yield Step
+            continue
+        Before = Board[:N]
+        for Name, Technique in Techniques:
+            if GridNow.RunStep(Name, Technique, GridNow):
+                break
+        else:
+            Guess, Fewest = PickGuess(GridNow)
+            Snap = GridNow.Snapshot()
+            Solved = GuessSolve(GridNow)
+            Number = Board[TheShape.NumberStart + Guess]
+            GridNow.Restore(Snap)
+            if Solved is None:
+                raise ValueError("This puzzle has no solution")
+            GridNow.Place(Guess, 1 << (Number - 1))
+            yield (Guess, TheShape.Digits[Number - 1], "Guess", True)
+            continue
+        Steps = []
+        for i in range(N):
+            Gone = Before[i] & ~Board[i]
+            while Gone:
+                Bit = Gone & -Gone
+                Gone ^= Bit
+                Steps.append((i, TheShape.Digits[Bit.bit_length() - 1], Name, False))
+        for Step in Steps:
+            yield Step
+
+#Counts the solutions of a puzzle, but stops as soon as it has found Limit of
+#them. So with the usual Limit of 2, it gives 0 for a puzzle with no
+#solution, 1 for a proper puzzle, and 2 for one with more than one solution,
+#and it takes about as long as solving the puzzle does, not as long as
+#finding every solution would. It works like BacktrackSolve, except that a
+#guess that leads to a solution is undone too, so that the next Option gets
+#a go. A guess that leaves a Cell without Options is given up on straight
+#away, since Place and Propagate notice that as soon as it happens. Engine
+#"DancingLinks" counts with DancingLinksSolutions instead. The grid is left
+#the way it was.
+def CountSolutions(GridNow, Limit = 2, Engine = "Deduction"):
+    if Engine == "DancingLinks":
+        return len(DancingLinksSolutions(GridNow, Limit))
+    elif Engine != "Deduction":
+        raise ValueError("Unknown engine: " + str(Engine))
+    Before = GridNow.Snapshot()
+    Count = 0
+    if Limit > 0 and GridNow.DeduceAll():
+        Count = CountGuesses(GridNow, Limit)
+    GridNow.Restore(Before)
+    return Count
+
+#The guessing part of CountSolutions, like GuessSolve.
+def CountGuesses(GridNow, Limit):
+    if GridNow.EmptyCount == 0:
+        return 1
+    Guess, Fewest = PickGuess(GridNow)
+    Before = GridNow.Snapshot()
+    Count = 0
+    Mask = GridNow.Board[Guess]
+    while Mask and Count < Limit:
+        Bit = Mask & -Mask
+        Mask ^= Bit
+        if GridNow.Place(Guess, Bit) and GridNow.Propagate():
+            Count += CountGuesses(GridNow, Limit - Count)
+        GridNow.Restore(Before)
+    return Count
+
+#True if the puzzle has exactly one solution.
+def HasUniqueSolution(GridNow):
+    return CountSolutions(GridNow, 2) == 1
+
+#Finds up to Limit solutions of the grid (as flat lists of numbers) as an
+#exact cover problem with Dancing Links (see DancingLinks.py). DeduceAll goes
+#first, and only the Options it leaves go into the table, so Dancing Links
+#only has to do the guessing: left to itself, with just the clues, it can
+#spend minutes on a 25x25 puzzle (propagating singles alone isn't enough to
+#stop that). The grid is left the way it was.
+def DancingLinksSolutions(GridNow, Limit = 1):
+    TheShape = GridNow.Shape
+    N = TheShape.CellCount
+    Board = GridNow.Board
+    Before = GridNow.Snapshot()
+    Solutions = []
+    if GridNow.DeduceAll():
+        Solutions = DancingLinks.SolveSudoku(Board[N:2 * N], TheShape.BoxSize, Limit, Board[:N])
+    GridNow.Restore(Before)
+    return Solutions
+
+#Solves the grid with DancingLinksSolutions and writes the answer back into
+#its Cells, so the result is a Grid just like the one RecursiveSolve gives
+#back.
+def DancingLinksSolve(GridNow):
+    Solutions = DancingLinksSolutions(GridNow)
+    if not Solutions:
+        raise ValueError("This puzzle has no solution")
+    GridNow.Fill(Solutions[0])
+    return GridNow
 
 #Puts the grid on display for the whole world to see. It's really presentable
 #and easy to read right now...
 def DisplayGrid(TheGrid):
-    for r in range(9):
-        ThisRow = ""
-        for c in range(9):
-            ThisRow += TheGrid.Cells[r,c].Number
-        print(ThisRow)
+    TheShape = TheGrid.Shape
+    Size = TheShape.Size
+    Digits = " " + TheShape.Digits
+    Numbers = TheGrid.Board[TheShape.NumberStart:TheShape.UsedStart]
+    for r in range(Size):
+        print("".join([Digits[n] for n in Numbers[r * Size:r * Size + Size]]))
 
-#Where to start.
+#The opposite of ReadGrid: the whole grid on one line, with "." for an empty
+#cell.
+def GridToLine(TheGrid):
+    TheShape = TheGrid.Shape
+    Digits = "." + TheShape.Digits
+    return "".join([Digits[n] for n in TheGrid.Board[TheShape.NumberStart:TheShape.UsedStart]])
+
+#Where to start. Puzzles given on the command line, on one line each (see
+#ReadNumbers), get solved and their solutions printed one per line, or "No
+#solution". That's the quick way in, for when a program wants one puzzle
+#solved at a time. (It's sys.argv rather than argparse, because argparse
+#takes longer to import than most puzzles take to solve.) Without any, it
+#solves the puzzle from FirstGridInput, and shows its working.
 def main():
+    if len(sys.argv) > 1:
+        for Line in sys.argv[1:]:
+            try:
+                print(GridToLine(RecursiveSolve(ReadGrid(Line))))
+            except ValueError:
+                print("No solution")
+        return
     MainGrid = FirstGridInput()
     DisplayGrid(MainGrid)
     print("---------")
     #If RecursiveSolve isn't doing it for you, go step-by-step with this "for"
     #loop and tell it how many steps you want it to do.
-    """for x in range(20):
-        MainGrid.GetAllOptions()
-        MainGrid.FillAllNumbers()
-        DisplayGrid(MainGrid)
-        print("---------")"""
+    """from itertools import islice
+    for Index, Number, Technique, Placed in islice(IterSolve(MainGrid), 20):
+        print(("Put %s in" if Placed else "Take %s out of") % Number,
+              "row", Index // MainGrid.Shape.Size + 1, "column",
+              Index % MainGrid.Shape.Size + 1, "(" + Technique + ")")
+    DisplayGrid(MainGrid)
+    print("---------")"""
     MainGrid = RecursiveSolve(MainGrid)
     DisplayGrid(MainGrid)
 